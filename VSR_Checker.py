@@ -1,45 +1,87 @@
 import streamlit as st
 import pandas as pd
-from bs4 import BeautifulSoup
-import re
-import requests
+import math
+import getpass
+import hashlib
+import numpy as np
 from io import BytesIO
-from packaging import version
-import pdfkit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from vsr_compare import STATUS_VALUES, VARIANT_COLUMNS, ScanSummary, build_master_index
+from master_list import (MASTER_LIST_PATH, clear_master_cache, empty_master_list, export_master_workbook, get_master,
+                         open_master_store, save_master_edits)
+from master_store import MasterListConflict
+from results_cache import check_vsr_cached, results_cache_stats, vsr_digest
+from action_plan import generate_action_plan
+from styling import highlight_status
+from excel_export import XLSX_MIME, excel_report_bytes
+from pdf_export import get_pdf_job, submit_pdf_job
+from vsr_archive import VsrArchive
+from vsr_diff import diff_against_previous
+from readme_cache import load_readme
+from result_filters import ResultFilter
+from diagnostics import reset_stage_stats, set_memory_tracing, stage, stage_stats
+from fleet_store import FLEET_GROUPINGS, fleet_partitions, mismatch_rates, record_results
 
 # === CONFIGURATION ===
-MASTER_LIST_PATH = r'z:\dp.staging.ah\tmp\VSR_Checker_Data\Master_SW_List.xlsx'
-README_URL = "https://raw.githubusercontent.com/gabrielsteinerstellantis/VSR_Checker/main/readme.txt"
+RESULTS_PAGE_SIZE = 500  # rows styled and rendered per page of the results table
+UPLOAD_WORKERS = 4  # threads parsing newly uploaded VSRs
 
 
 # === FUNCTIONS ===
 
-@st.cache_data
-def load_master_list():
+def load_master():
+    # Served from the revision-keyed master list cache; only re-read when someone saves
     try:
-        df = pd.read_excel(MASTER_LIST_PATH, sheet_name="Master SW List", engine="openpyxl")
-        return df
+        # Edits are saved to the change log store, so start one from the workbook on first use
+        open_master_store(MASTER_LIST_PATH, create=True)
+    except Exception as e:
+        st.sidebar.warning(f"Master list history unavailable, edits can't be saved: {e}")
+    try:
+        return get_master(MASTER_LIST_PATH)
     except Exception as e:
         st.error(f"Error loading master SW list: {e}")
-        return pd.DataFrame(columns=["ECU", "Part #", "SW Version", "Priority", "FI Owner", "Subsystem Owner"])
+        df = empty_master_list()
+        return df, build_master_index(df), None
+
+
+def save_master_list(editable_df, edited_df, editor_state, base_version):
+    # Saves only the rows changed in the editor. data_editor reports them by row position; the
+    # editor frame's index holds the store's row ids.
+    row_ids = editable_df.index
+    updated = {int(row_ids[pos]): cells for pos, cells in editor_state.get("edited_rows", {}).items()}
+    inserted = [{col: value for col, value in row.items() if col != "_index"}
+                for row in editor_state.get("added_rows", [])]
+    inserted = [row for row in inserted if any(value not in (None, "") for value in row.values())]
+    deleted = [int(row_ids[pos]) for pos in editor_state.get("deleted_rows", [])]
+    try:
+        version = save_master_edits(base_version, updated, inserted, deleted, MASTER_LIST_PATH, getpass.getuser())
+        st.session_state.master_saved = version[-1]
+        return True
+    except MasterListConflict as e:
+        st.sidebar.error(f"Not saved. {e}. Reload the master list and make your edits again, "
+                         f"or download them below.")
+    except Exception as e:
+        st.sidebar.error(f"Error saving master SW list: {e}")
+    save_local(edited_df)
+    return False
 
 
-def save_master_list(df):
+def export_master_list(df):
     try:
-        df.to_excel(MASTER_LIST_PATH, index=False, sheet_name="Master SW List", engine="openpyxl")
-        st.success("Master SW List saved successfully!")
+        revision = export_master_workbook(MASTER_LIST_PATH)
+        st.sidebar.success(f"Master SW List workbook updated (revision {revision}).")
     except PermissionError:
-        st.warning("Cannot save: Master SW List is open in another program! Download your changes instead below.")
+        st.sidebar.warning("Cannot export: Master SW List is open in another program! Download it instead below.")
         save_local(df)
     except Exception as e:
-        st.error(f"Error saving master SW list: {e}")
+        st.sidebar.error(f"Error exporting master SW list: {e}")
 
 
 def save_local(df):
     towrite = BytesIO()
     df.to_excel(towrite, index=False, sheet_name="Master SW List", engine="openpyxl")
     towrite.seek(0)
-    st.download_button(
+    st.sidebar.download_button(
         label="💾 Download Master List Locally",
         data=towrite,
         file_name="Master_SW_List_backup.xlsx",
@@ -47,266 +89,161 @@ def save_local(df):
     )
 
 
-def load_readme():
+@st.cache_resource
+def get_vsr_archive():
+    return VsrArchive()
+
+
+def archive_upload(html_content, file_name, vsr_df, digest, vehicle):
+    # Back up every uploaded VSR once; duplicates are skipped by content hash.
+    # Returns whether it was new to the archive, or None if it was already handled this session.
+    if digest in st.session_state.archived_vsrs:
+        return None
     try:
-        response = requests.get(README_URL)
-        if response.status_code == 200:
-            return response.text
-        else:
-            return "Unable to load ReadMe from GitHub."
-    except:
-        return "Unable to load ReadMe from GitHub."
-
-
-def parse_vsr_html(html):
-    soup = BeautifulSoup(html, "html.parser")
-    ecu_data = []
-
-    ecu_table = soup.find("table", {"id": "ecuInformationTable"})
-    if ecu_table:
-        rows = ecu_table.find_all("tr")[1:]
-        for row in rows:
-            cells = row.find_all("td")
-            if not cells:
-                continue
-            if len(cells) == 2 and "No positive response" in cells[1].get_text():
-                ecu = cells[0].get_text(strip=True)
-                ecu_data.append({"ECU": ecu, "Part #": "N/A", "SW Version": "N/A"})
-                continue
-            if len(cells) >= 8:
-                ecu = cells[0].get_text(strip=True)
-                part_number = cells[3].get_text(strip=True)
-                sw_version = cells[7].get_text(strip=True)
-                ecu_data.append({
-                    "ECU": ecu,
-                    "Part #": part_number,
-                    "SW Version": sw_version
-                })
-    return pd.DataFrame(ecu_data)
-
-
-def compare_sw_versions_advanced(reported_sw, expected_sw):
-    if pd.isna(expected_sw) or pd.isna(reported_sw) or expected_sw == "N/A" or reported_sw == "N/A":
-        return "❌ Not Found"
+        _, is_new = get_vsr_archive().ingest(html_content, file_name=file_name, vsr_df=vsr_df, digest=digest,
+                                            vehicle=vehicle)
+    except Exception as e:
+        st.warning(f"Could not archive {file_name}: {e}")
+        return None
+    st.session_state.archived_vsrs.add(digest)
+    return is_new
+
+
+def check_upload(html_content, digest):
+    # Runs on the upload thread pool: no Streamlit calls in here
     try:
-        reported_sw = str(reported_sw)
-        expected_sw = str(expected_sw)
-        reported_match = re.search(r'\d+\.\d+\.\d+', reported_sw)
-        expected_match = re.search(r'\d+\.\d+\.\d+', expected_sw)
-        reported_sw_clean = reported_match.group(0) if reported_match else reported_sw
-        expected_sw_clean = expected_match.group(0) if expected_match else expected_sw
-        if version.parse(reported_sw_clean) == version.parse(expected_sw_clean):
-            return "✅ Match"
-        elif version.parse(reported_sw_clean) > version.parse(expected_sw_clean):
-            return "💜 Newer"
-        else:
-            return "⚠️ Older"
-    except version.InvalidVersion:
-        # Assuming invalid version format might imply older or non-standard
-        return "⚠️ Older"
-
-
-def get_part_suffix(pn):
-    return pn.strip()[-2:].upper() if isinstance(pn, str) and len(pn.strip()) >= 2 else ""
-
-
-def compare_part_numbers(reported, expected):
-    if expected == "N/A" or reported == "N/A":
-        return "❌ Not Found"
-    suffix_r = get_part_suffix(reported)
-    suffix_e = get_part_suffix(expected)
-    if suffix_r == suffix_e:
-        return "✅ Match"
-    elif suffix_r > suffix_e:
-        return "💜 Newer"
+        scan, results_df, summary = check_vsr_cached(html_content, master_index, master_version, digest=digest)
+        return {"vsr_df": scan.ecus, "results_df": results_df, "vehicle": scan.vehicle, "summary": summary,
+                "filter": ResultFilter(results_df), "error": None}
+    except Exception as e:
+        return {"vsr_df": pd.DataFrame(), "results_df": pd.DataFrame(), "vehicle": {}, "summary": ScanSummary(),
+                "filter": None, "error": str(e)}
+
+
+def check_uploads(uploaded_files):
+    # Files already checked this session (same content and master list) are reused; only new
+    # ones are parsed, concurrently, with a progress bar
+    checked = st.session_state.checked_uploads
+    batch, todo = [], {}
+    for uploaded in uploaded_files:
+        html_content = uploaded.getvalue()
+        key = (vsr_digest(html_content), master_version)
+        batch.append((uploaded.name, html_content, key))
+        if key not in checked:
+            todo.setdefault(key, html_content)
+
+    if todo:
+        progress = st.progress(0.0, text=f"Parsing {len(todo)} VSR file(s)...")
+        with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, len(todo))) as pool:
+            futures = {pool.submit(check_upload, html_content, key[0]): key for key, html_content in todo.items()}
+            for done, future in enumerate(as_completed(futures), start=1):
+                checked[futures[future]] = future.result()
+                progress.progress(done / len(todo), text=f"Parsed {done}/{len(todo)} VSR files")
+        progress.empty()
+
+    # Forget files that were removed from the uploader
+    current = {key for _, _, key in batch}
+    for key in [key for key in checked if key not in current]:
+        del checked[key]
+    return [dict(checked[key], name=name, html=html_content, digest=key[0]) for name, html_content, key in batch]
+
+
+def vehicle_summary(uploads):
+    # Counters come from each upload's ScanSummary, filled in while it was compared
+    rows = []
+    for upload in uploads:
+        row = upload["summary"].as_row()
+        rows.append({
+            "VIN": upload["vehicle"].get("VIN") or "Unknown",
+            "File": upload["name"],
+            **{col: value for col, value in row.items() if col != "VIN"},
+            "Error": upload["error"] or ("No ECU data found" if upload["vsr_df"].empty else ""),
+        })
+    return pd.DataFrame(rows)
+
+
+def format_ratio(count, total, percent):
+    return f"{count}/{total} ({percent:.1f}%)" if percent is not None else f"{count}/{total}"
+
+
+def record_fleet_results(results_df, digest, vehicle):
+    # Every comparison goes to the fleet results store, once per VSR and master list revision
+    key = (digest, master_version)
+    if key in st.session_state.fleet_recorded:
+        return
+    try:
+        record_results(results_df, digest, vehicle)
+    except Exception as e:
+        st.warning(f"Could not save results to the fleet store: {e}")
+        return
+    st.session_state.fleet_recorded.add(key)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_fleet_rates(by, start, end, programs):
+    return mismatch_rates(by, start, end, list(programs) or None)
+
+
+@st.fragment
+def fleet_dashboard():
+    # Runs on its own so changing a filter only re-queries the store, not the whole page
+    st.subheader("📈 Fleet Overview")
+    partitions = fleet_partitions()
+    if partitions.empty:
+        st.info("No results stored yet. Every checked VSR is added to the fleet store.")
+        return
+    first, last = pd.to_datetime(partitions["scan_date"]).agg(["min", "max"]).dt.date
+    cols = st.columns(3)
+    with cols[0]:
+        dates = st.date_input("Scan dates", (first, last), min_value=first, max_value=last, key="fleet_dates")
+    with cols[1]:
+        programs = st.multiselect("Programs", sorted(partitions["program"].unique()), key="fleet_programs")
+    with cols[2]:
+        by = st.selectbox("Group by", FLEET_GROUPINGS, key="fleet_by")
+    start, end = (dates[0], dates[-1]) if dates else (None, None)
+    rates = load_fleet_rates(by, start, end, tuple(programs))
+    st.caption(f"{int(rates['ECU Rows'].sum()) if not rates.empty else 0} ECU rows. Mismatch % counts Older and "
+               f"Newer among the rows that could be compared with the Master SW List.")
+    st.dataframe(rates, use_container_width=True, hide_index=True)
+
+
+@st.fragment(run_every=1)
+def wait_for_pdf(pdf_job):
+    # Polls the background render without blocking the rest of the page
+    if pdf_job.done():
+        st.rerun()
+    st.info("⏳ Rendering PDF in the background...")
+
+
+def diagnostics_panel():
+    # Stage timings of this app process (every session) since it started or the last reset
+    st.sidebar.checkbox("Trace memory (slower)", key="trace_memory",
+                        on_change=lambda: set_memory_tracing(st.session_state.trace_memory))
+    stats = stage_stats()
+    if stats.empty:
+        st.sidebar.caption("No stages recorded yet.")
     else:
-        return "⚠️ Older"
-
-
-def compare_to_master(vsr_df, master_df):
-    results = []
-    for _, row in vsr_df.iterrows():
-        ecu = row["ECU"]
-        reported_part = row.get("Part #")  # Use .get() to handle potential missing keys
-        reported_sw = row.get("SW Version") # Use .get()
-        match = master_df[master_df["ECU"] == ecu]
-        if not match.empty:
-            expected_part = match.iloc[0].get("Part #", "N/A")
-            expected_sw = match.iloc[0].get("SW Version", "N/A")
-            priority = match.iloc[0].get("Priority", "N/A")
-            fi_owner = match.iloc[0].get("FI Owner", "N/A")
-            subsystem_owner = match.iloc[0].get("Subsystem Owner", "N/A")
-
-            if reported_part is None or pd.isna(reported_part) or str(reported_part).strip() == "":
-                part_status = "❌ Not Found"
-            else:
-                part_status = compare_part_numbers(reported_part, expected_part)
+        st.sidebar.dataframe(stats.round(4), hide_index=True, use_container_width=True)
+        st.sidebar.caption("Seconds are wall time; peak_mb needs memory tracing on.")
+    if st.sidebar.button("Reset timings"):
+        reset_stage_stats()
+        st.rerun()
 
-            if reported_sw is None or pd.isna(reported_sw) or str(reported_sw).strip() == "":
-                sw_status = "❌ Not Found"
-            else:
-                sw_status = compare_sw_versions_advanced(reported_sw, expected_sw)
-
-        else:
-            expected_part = "N/A"
-            expected_sw = "N/A"
-            priority = "N/A"
-            fi_owner = "N/A"
-            subsystem_owner = "N/A"
-            part_status = "❌ Not Found"
-            sw_status = "❌ Not Found"
-
-        results.append({
-            "ECU": ecu,
-            "🚗Reported Part #": reported_part,
-            "📒Expected Part #": expected_part,
-            "Part Status": part_status,
-            "🚗Reported SW": reported_sw,
-            "📒Expected SW": expected_sw,
-            "SW Status": sw_status,
-            "Priority": priority,
-            "FI Owner": fi_owner,
-            "Subsystem Owner": subsystem_owner
-        })
-    return pd.DataFrame(results)
-
-
-def highlight_status(row):
-    styles = [('') for _ in row.index]  # Default: no style
-
-    if row["Part Status"] == "⚠️ Older":
-        part_color = 'background-color: #fff3cd; color: #856404'
-        styles[row.index.get_loc("🚗Reported Part #")] = part_color
-        styles[row.index.get_loc("📒Expected Part #")] = part_color
-        styles[row.index.get_loc("Part Status")] = part_color
-    elif row["Part Status"] == "❌ Not Found":
-        part_color = 'background-color: #f8d7da; color: #721c24'
-        styles[row.index.get_loc("🚗Reported Part #")] = part_color
-        styles[row.index.get_loc("📒Expected Part #")] = part_color
-        styles[row.index.get_loc("Part Status")] = part_color
-    elif row["Part Status"] == "💜 Newer":
-        part_color = 'background-color: #e0b0ff; color: #4b0082'
-        styles[row.index.get_loc("🚗Reported Part #")] = part_color
-        styles[row.index.get_loc("📒Expected Part #")] = part_color
-        styles[row.index.get_loc("Part Status")] = part_color
-    elif row["Part Status"] == "✅ Match":
-        part_color = 'background-color: #d4edda; color: #155724'
-        styles[row.index.get_loc("🚗Reported Part #")] = part_color
-        styles[row.index.get_loc("📒Expected Part #")] = part_color
-        styles[row.index.get_loc("Part Status")] = part_color
-
-    if row["SW Status"] == "⚠️ Older":
-        sw_color = 'background-color: #fff3cd; color: #856404'
-        styles[row.index.get_loc("🚗Reported SW")] = sw_color
-        styles[row.index.get_loc("📒Expected SW")] = sw_color
-        styles[row.index.get_loc("SW Status")] = sw_color
-    elif row["SW Status"] == "❌ Not Found":
-        sw_color = 'background-color: #f8d7da; color: #721c24'
-        styles[row.index.get_loc("🚗Reported SW")] = sw_color
-        styles[row.index.get_loc("📒Expected SW")] = sw_color
-        styles[row.index.get_loc("SW Status")] = sw_color
-    elif row["SW Status"] == "💜 Newer":
-        sw_color = 'background-color: #e0b0ff; color: #4b0082'
-        styles[row.index.get_loc("🚗Reported SW")] = sw_color
-        styles[row.index.get_loc("📒Expected SW")] = sw_color
-        styles[row.index.get_loc("SW Status")] = sw_color
-    elif row["SW Status"] == "✅ Match":
-        sw_color = 'background-color: #d4edda; color: #155724'
-        styles[row.index.get_loc("🚗Reported SW")] = sw_color
-        styles[row.index.get_loc("📒Expected SW")] = sw_color
-        styles[row.index.get_loc("SW Status")] = sw_color
-
-    return styles
-
-
-def generate_action_plan(results_df):
-    priority_1_ecus = []
-    priority_2_ecus = []
-    priority_3_ecus = []
-    other_ecus_no_update = []
-    missing_ecus = []
-
-    for _, row in results_df.iterrows():
-        needs_update = "⚠️ Older" in [row["Part Status"], row["SW Status"]] or "❌ Not Found" in [row["Part Status"], row["SW Status"]]
-
-        if needs_update:
-            ecu_info = {
-                "ECU": row["ECU"],
-                "Reported Part #": row["🚗Reported Part #"],
-                "Expected Part #": row["📒Expected Part #"],
-                "Reported SW": row["🚗Reported SW"],
-                "Expected SW": row["📒Expected SW"],
-                "FI Owner": row["FI Owner"],
-                "Subsystem Owner": row["Subsystem Owner"]
-            }
-            if row["Priority"] == 1:
-                priority_1_ecus.append(ecu_info)
-            elif row["Priority"] == 2:
-                priority_2_ecus.append(ecu_info)
-            elif row["Priority"] == 3:
-                priority_3_ecus.append(ecu_info)
-            elif pd.isna(row["Priority"]):
-                priority_1_ecus.append(ecu_info) # Treat missing priority as critical for now - adjust as needed
-            else:
-                # Consider ECUs needing update with other priorities
-                pass # Decide how to handle or categorize these
-        elif "❌ Not Found" in [row["Part Status"], row["SW Status"]]:
-            missing_ecus.append(row["ECU"])
-        elif row["Priority"] == 0:
-            other_ecus_no_update.append(row["ECU"])
-
-    action_plan = {}
-    action_plan["priority_1"] = pd.DataFrame(priority_1_ecus)
-    action_plan["priority_2"] = pd.DataFrame(priority_2_ecus)
-    action_plan["priority_3"] = pd.DataFrame(priority_3_ecus)
-    action_plan["other_no_update"] = other_ecus_no_update
-    action_plan["missing"] = missing_ecus
-
-    return action_plan
-
-def generate_action_plan_html(action_plan):
-    html = """
-    <html>
-    <head>
-        <style>
-            body {font-family: sans-serif;}
-            h2 {color: #333;}
-            h3 {color: #555; margin-top: 1em;}
-            table {width: 100%; border-collapse: collapse;}
-            th, td {border: 1px solid #ddd; padding: 8px; text-align: left;}
-            th {background-color: #f2f2f2;}
-            .priority-1 {background-color: #f8d7da;} /* Light red */
-            .priority-2 {background-color: #fff3cd;} /* Light yellow */
-            .priority-3 {background-color: #d4edda;} /* Light green */
-            .missing {color: red; font-weight: bold;}
-        </style>
-    </head>
-    <body>
-        <h2>Action Plan</h2>
-    """
-
-    if not action_plan["priority_1"].empty:
-        html += "<h3>Priority 1: Update Critical Base Vehicle ECUs</h3>"
-        html += action_plan["priority_1"].to_html(index=False)
-
-    if not action_plan["priority_2"].empty:
-        html += "<h3>Priority 2: Update ADAS ECUs</h3>"
-        html += action_plan["priority_2"].to_html(index=False)
-
-    if not action_plan["priority_3"].empty:
-        html += "<h3>Priority 3: Update Low Priority Base Vehicle ECUs</h3>"
-        html += action_plan["priority_3"].to_html(index=False)
-
-    if action_plan["missing"]:
-        html += "<h3>Missing ECUs</h3>"
-        html += "<p class='missing'>The following ECUs were not found in the Master SW List: " + ", ".join(action_plan['missing']) + ".</p>"
-
-    if action_plan["other_no_update"]:
-        html += "<h3>Other ECUs</h3>"
-        html += "<p>The following ECUs do not require updates: " + ", ".join(action_plan['other_no_update']) + ".</p>"
-
-    html += "</body></html>"
-    return html
+
+def show_pdf_download(pdf_job):
+    try:
+        pdf = pdf_job.result()
+    except Exception as e:
+        st.error(f"Error generating PDF: {e}")
+        return
+    if pdf["note"]:
+        st.caption(f"Rendered with the built-in renderer ({pdf['note']}). Install wkhtmltopdf for full formatting.")
+    st.download_button(
+        label="⬇️ Download Action Plan as PDF",
+        data=pdf["data"],
+        file_name="action_plan.pdf",
+        mime="application/pdf"
+    )
 
 # === PAGE SETUP ===
 st.set_page_config(page_title="Vehicle Scan Report Checker", layout="wide")
@@ -315,27 +252,67 @@ st.title("🚗 Vehicle Scan Report Checker")
 # === SESSION STATE SETUP ===
 if "hidden_ecus" not in st.session_state:
     st.session_state.hidden_ecus = set()
+if "archived_vsrs" not in st.session_state:
+    st.session_state.archived_vsrs = set()
+if "fleet_recorded" not in st.session_state:
+    st.session_state.fleet_recorded = set()
+if "checked_uploads" not in st.session_state:
+    st.session_state.checked_uploads = {}
 
 # === LOAD MASTER LIST ON STARTUP ===
-master_df = load_master_list()
-
-# === UPLOAD VSR FILE ===
-uploaded_file = st.file_uploader("Upload VSR HTML file", type="htm")
+master_df, master_index, master_version = load_master()
+
+# === UPLOAD VSR FILES ===
+uploaded_files = st.file_uploader("Upload VSR HTML files", type=["htm", "html"], accept_multiple_files=True)
+
+selected = None
+if uploaded_files:
+    uploads = check_uploads(uploaded_files)
+    for upload in uploads:
+        if not upload["vsr_df"].empty:
+            record_fleet_results(upload["results_df"], upload["digest"], upload["vehicle"])
+    archived = [archive_upload(u["html"], u["name"], u["vsr_df"], u["digest"], u["vehicle"]) for u in uploads if not u["error"]]
+    if any(is_new is not None for is_new in archived):
+        st.caption(f"🗄️ VSR archive: {sum(is_new is True for is_new in archived)} new, "
+                   f"{sum(is_new is False for is_new in archived)} already stored.")
+
+    if len(uploads) > 1:
+        # === VEHICLE SUMMARY ===
+        st.subheader("🚘 Vehicles")
+        st.dataframe(vehicle_summary(uploads), use_container_width=True, hide_index=True)
+        by_label = {f"{i}. {u['vehicle'].get('VIN') or 'Unknown VIN'} ({u['name']})": u for i, u in enumerate(uploads, start=1)}
+        selected = by_label[st.selectbox("🔎 Show details for", list(by_label), key="selected_upload")]
+    else:
+        selected = uploads[0]
 
-if uploaded_file:
-    with st.spinner("Processing VSR file..."):
-        html_content = uploaded_file.read()
-        vsr_df = parse_vsr_html(html_content)
+if selected:
+    # Drill-down: the single-vehicle view for the selected upload
+    vsr_sha256 = selected["digest"]
+    vsr_df = selected["vsr_df"]
+    vehicle = selected["vehicle"]
+    if selected["error"]:
+        st.error(f"Error processing {selected['name']}: {selected['error']}")
 
     if vsr_df.empty:
         st.error("No ECU data found in the HTML file.")
         results_df = pd.DataFrame() # Initialize an empty results_df
     else:
-        results_df = compare_to_master(vsr_df, master_df)
-
-        # Count Part Statuses
-        part_counts = results_df["Part Status"].value_counts()
-        sw_counts = results_df["SW Status"].value_counts()
+        results_df = selected["results_df"]
+
+        # === SCAN SUMMARY ===
+        summary = selected["summary"]
+        st.markdown(
+            f"**VIN:** {vehicle.get('VIN') or 'Unknown'} &nbsp;·&nbsp; "
+            f"**Vehicle:** Year {vehicle.get('Model Year') or '?'}, Body {vehicle.get('Body') or '?'}  \n"
+            f"**ECUs in Master List:** {format_ratio(summary.in_master, summary.ecus, summary.coverage)} &nbsp;·&nbsp; "
+            f"**Part ✅ Match:** {format_ratio(summary.part_status['✅ Match'], summary.in_master, summary.part_match_rate)} &nbsp;·&nbsp; "
+            f"**SW ✅ Match:** {format_ratio(summary.sw_status['✅ Match'], summary.in_master, summary.sw_match_rate)}"
+        )
+
+        # Status counts come from the scan summary; filtering from the masks precomputed for this result
+        result_filter = selected["filter"]
+        part_counts = summary.part_status
+        sw_counts = summary.sw_status
 
         def count(label, counts):
             return counts.get(label, 0)
@@ -366,209 +343,183 @@ if uploaded_file:
 
             # --- Priority Filter ---
             st.markdown("**ECU Filtering – by Priority:**")
-            priority_values = results_df["Priority"].dropna().unique()
-            priority_values = [int(p) for p in priority_values if str(p).isdigit()]
-            # Define possible priorities explicitly for consistent ordering/display
-            possible_priorities = {0, 1, 2, 3}
-            priority_values_to_show = sorted(set(priority_values) & possible_priorities)
+            priority_values_to_show = result_filter.priorities()
 
+            priority_selected = []
             if priority_values_to_show:
                 cols_priority = st.columns(len(priority_values_to_show))
-                priority_selected = []
                 for i, p in enumerate(priority_values_to_show):
                     with cols_priority[i]:
                         if st.checkbox(f"Priority {p}", value=True, key=f"priority_{p}"):
                             priority_selected.append(p)
             else:
                 st.caption("No priorities (0-3) found in results for filtering.")
-                priority_selected = [] # Ensure it's defined even if no checkboxes shown
 
         # === APPLY FILTERS ===
-        filtered_df = results_df.copy()
-
-        part_status_filters = []
-        if part_match: part_status_filters.append("✅ Match")
-        if part_older: part_status_filters.append("⚠️ Older")
-        if part_newer: part_status_filters.append("💜 Newer")
-        if part_notfound: part_status_filters.append("❌ Not Found")
-
-        sw_status_filters = []
-        if sw_match: sw_status_filters.append("✅ Match")
-        if sw_older: sw_status_filters.append("⚠️ Older")
-        if sw_newer: sw_status_filters.append("💜 Newer")
-        if sw_notfound: sw_status_filters.append("❌ Not Found")
-
-        filtered_df = filtered_df[filtered_df["Part Status"].isin(part_status_filters)]
-        filtered_df = filtered_df[filtered_df["SW Status"].isin(sw_status_filters)]
-
-        if search:
-            filtered_df = filtered_df[filtered_df["ECU"].str.contains(search, case=False, na=False)]
-
-        # Check if priority_selected exists and is not empty before filtering
-        if 'priority_selected' in locals() and priority_selected:
-            filtered_df = filtered_df[filtered_df["Priority"].isin(priority_selected)]
-
-        # Apply ECU hiding filter
-        if st.session_state.hidden_ecus:
-            filtered_df = filtered_df[~filtered_df["ECU"].isin(st.session_state.hidden_ecus)]
+        part_status_filters = [status for status, on in zip(STATUS_VALUES, (part_match, part_older, part_newer, part_notfound)) if on]
+        sw_status_filters = [status for status, on in zip(STATUS_VALUES, (sw_match, sw_older, sw_newer, sw_notfound)) if on]
+        filter_mask = result_filter.mask(part_status_filters, sw_status_filters, priority_selected,
+                                         st.session_state.hidden_ecus, search)
+        filtered_df = results_df[filter_mask]
 
         # === DISPLAY RESULTS ===
         st.subheader("📋 Comparison Results")
-        styled_df = filtered_df.style.apply(highlight_status, axis=1)
 
+        # Only the visible page is styled and sent to the browser
+        num_pages = max(1, math.ceil(len(filtered_df) / RESULTS_PAGE_SIZE))
+        page = 1
+        if num_pages > 1:
+            page = st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages, value=1, key=f"results_page_{vsr_sha256}")
+            st.caption(f"Showing rows {(page - 1) * RESULTS_PAGE_SIZE + 1}–{min(page * RESULTS_PAGE_SIZE, len(filtered_df))} "
+                       f"of {len(filtered_df)}")
+        page_df = filtered_df.iloc[(page - 1) * RESULTS_PAGE_SIZE:page * RESULTS_PAGE_SIZE]
         # Dynamically calculate height based on the number of rows
         max_rows = 50
         row_height = 36  # Approximate height for each row in pixels + header
-        num_rows_to_display = len(filtered_df)
+        num_rows_to_display = len(page_df)
         # Calculate height: base height for header + height per row, capped by max_rows
         container_height = min( (num_rows_to_display + 1) * row_height , max_rows * row_height + row_height)
 
 
-        # Display the table with dynamic height
-        st.dataframe(styled_df, use_container_width=True, height=container_height)
-
-        def export_df_to_excel_with_color(df):
-            def color_cells(row):
-                styles = []
-                for col in df.columns:
-                    if col == "Part Status":
-                        if "✅" in row[col]:
-                            styles.append('background-color: #d4edda')
-                        elif "⚠️" in row[col]:
-                            styles.append('background-color: #fff3cd')
-                        elif "❌" in row[col]:
-                            styles.append('background-color: #f8d7da')
-                        elif "💜" in row[col]:
-                            styles.append('background-color: #e0b0ff')
-                        else:
-                            styles.append('')
-                    elif col == "SW Status":
-                        if "✅" in row[col]:
-                            styles.append('background-color: #d4edda')
-                        elif "⚠️" in row[col]:
-                            styles.append('background-color: #fff3cd')
-                        elif "❌" in row[col]:
-                            styles.append('background-color: #f8d7da')
-                        elif "💜" in row[col]:
-                            styles.append('background-color: #e0b0ff')
-                        else:
-                            styles.append('')
-                    elif col in ["🚗Reported Part #", "📒Expected Part #"]:
-                        status_col_index = df.columns.get_loc("Part Status")
-                        status = row[status_col_index]
-                        if "⚠️" in status:
-                            styles.append('background-color: #fff3cd')
-                        elif "❌" in status:
-                            styles.append('background-color: #f8d7da')
-                        elif "💜" in status:
-                            styles.append('background-color: #e0b0ff')
-                        else:
-                            styles.append('')
-                    elif col in ["🚗Reported SW", "📒Expected SW"]:
-                        status_col_index = df.columns.get_loc("SW Status")
-                        status = row[status_col_index]
-                        if "⚠️" in status:
-                            styles.append('background-color: #fff3cd')
-                        elif "❌" in status:
-                            styles.append('background-color: #f8d7da')
-                        elif "💜" in status:
-                            styles.append('background-color: #e0b0ff')
-                        else:
-                            styles.append('')
+        # Display the table with dynamic height (the Styler runs while the table is serialized)
+        with stage("results_table", rows=len(page_df)):
+            styled_df = page_df.style.apply(highlight_status, axis=None)
+            st.dataframe(styled_df, use_container_width=True, height=container_height)
+
+        # === CHANGES SINCE PREVIOUS SCAN ===
+        # Incremental diff against the last archived scan of the same vehicle
+        vin = vehicle["VIN"]
+        if vin:
+            with st.expander(f"🕑 Changes Since Previous Scan ({vin})", expanded=False):
+                try:
+                    previous, scan_diff = diff_against_previous(get_vsr_archive(), vin, vsr_df, vsr_sha256, master_index, vehicle)
+                except Exception as e:
+                    st.warning(f"Could not compare with previous scans: {e}")
+                else:
+                    if previous is None:
+                        st.caption("No earlier scan of this vehicle in the VSR archive.")
+                    elif scan_diff.empty:
+                        st.caption(f"No changes since the scan of {previous['scan_time'] or previous['ingested_at']}.")
                     else:
-                        styles.append('')
-                return styles
+                        st.dataframe(scan_diff, use_container_width=True, hide_index=True)
 
-            styled_df = df.style.apply(color_cells, axis=1)
+        # === GENERATE ACTION PLAN ===
+        action_plan = generate_action_plan(filtered_df)
 
-            towrite = BytesIO()
-            styled_df.to_excel(towrite, index=False, engine='xlsxwriter')
-            towrite.seek(0)
+        # === EXPORT OPTIONS ===
+        # The workbook is only built on request, then kept for as long as the filtered view is unchanged
+        export_key = (vsr_sha256, master_version, hashlib.sha256(np.packbits(filter_mask).tobytes()).hexdigest())
+        if st.button("📊 Prepare Excel export"):
+            st.session_state.excel_export = (export_key, excel_report_bytes(filtered_df, action_plan))
+        excel_export = st.session_state.get("excel_export")
+        if excel_export and excel_export[0] == export_key:
             st.download_button(
                 label="💾 Export to Excel",
-                data=towrite,
+                data=excel_export[1],
                 file_name="vsr_comparison.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                mime=XLSX_MIME
             )
 
-        # === EXPORT OPTIONS ===
-        export_df_to_excel_with_color(filtered_df)
-
-        # === GENERATE ACTION PLAN ===
-        action_plan = generate_action_plan(filtered_df)
-
         # === DISPLAY ACTION PLAN ===
         with st.expander("💡 Action Plan", expanded=True):
-            if not action_plan["priority_1"].empty:
-                st.subheader("Priority 1: Update Critical Base Vehicle ECUs")
-                st.dataframe(action_plan["priority_1"], use_container_width=True)
+            for title, section in action_plan.sections():
+                st.subheader(title)
+                st.dataframe(section, use_container_width=True)
 
-            if not action_plan["priority_2"].empty:
-                st.subheader("Priority 2: Update ADAS ECUs")
-                st.dataframe(action_plan["priority_2"], use_container_width=True)
-
-            if not action_plan["priority_3"].empty:
-                st.subheader("Priority 3: Update Low Priority Base Vehicle ECUs")
-                st.dataframe(action_plan["priority_3"], use_container_width=True)
-
-            if action_plan["missing"]:
+            if action_plan.missing:
                 st.subheader("Missing ECUs")
-                st.markdown(f"The following ECUs were not found in the Master SW List: {', '.join(action_plan['missing'])}.")
+                st.markdown(f"The following ECUs were not found in the Master SW List: {', '.join(map(str, action_plan.missing))}.")
 
-            if action_plan["other_no_update"]:
+            if action_plan.other_no_update:
                 st.subheader("Other ECUs")
-                st.markdown(f"The following ECUs do not require updates: {', '.join(action_plan['other_no_update'])}.")
+                st.markdown(f"The following ECUs do not require updates: {', '.join(map(str, action_plan.other_no_update))}.")
 
         # === PDF EXPORT ===
+        # Rendered on request in a background thread and cached by action plan content
         with st.expander("⎙ Export Action Plan to PDF", expanded=False):
-            action_plan_html = generate_action_plan_html(action_plan)
-            pdf_buffer = BytesIO()
-            try:
-                pdfkit.from_string(action_plan_html, pdf_buffer)
-                pdf_buffer.seek(0)
-                st.download_button(
-                    label="⬇️ Download Action Plan as PDF",
-                    data=pdf_buffer,
-                    file_name="action_plan.pdf",
-                    mime="application/pdf"
-                )
-            except Exception as e:
-                st.error(f"Error generating PDF: {e}. Make sure wkhtmltopdf is installed and in your PATH.")
+            pdf_job = get_pdf_job(action_plan)
+            if pdf_job is None and st.button("🖨️ Generate PDF"):
+                pdf_job = submit_pdf_job(action_plan)
+            if pdf_job is not None and not pdf_job.done():
+                wait_for_pdf(pdf_job)
+            elif pdf_job is not None:
+                show_pdf_download(pdf_job)
 
 # === SIDEBAR TOOLS ===
 st.sidebar.markdown("---")
 st.sidebar.header("🛠️ Tools")
 
+# === FLEET DASHBOARD ===
+if st.sidebar.checkbox("📈 Show fleet dashboard", key="show_fleet"):
+    fleet_dashboard()
+
 if st.sidebar.button("🔄 Reload Master List"):
-    st.cache_data.clear()
+    clear_master_cache()
     st.sidebar.success("Master List reloaded!")
     # Consider adding st.rerun() here if you want the main page to update immediately
 
+cache_stats = results_cache_stats()
+st.sidebar.caption(f"Results cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                   f"({cache_stats['size']}/{cache_stats['maxsize']} VSRs)")
+
+# === DIAGNOSTICS ===
+if st.sidebar.checkbox("🩺 Show diagnostics", key="show_diagnostics"):
+    diagnostics_panel()
+
 st.sidebar.subheader("📝 Edit Master SW List")
-raw_df = load_master_list()
+raw_df = master_df  # Same cached object the comparison uses - don't modify it in place
 columns_to_keep = ["ECU", "Part #", "SW Version", "Priority", "FI Owner", "Subsystem Owner"]
-# Ensure all columns exist, even if empty, before selecting
+# Model Year / Body columns are optional; keep them when the list uses variant-specific rows
+columns_to_keep += [col for col in VARIANT_COLUMNS if col in raw_df.columns]
+editable_df = raw_df.reindex(columns=columns_to_keep)
+# Ensure all columns exist, even if empty
 for col in columns_to_keep:
     if col not in raw_df.columns:
-        raw_df[col] = None # Or appropriate default
-editable_df = raw_df[columns_to_keep].copy()
+        editable_df[col] = None # Or appropriate default
 
+# Keyed by revision: after a save the editor starts over from the saved list
+editor_key = f"editor_{master_version}"
 edited_df = st.sidebar.data_editor(
     editable_df,
     use_container_width=True,
     num_rows="dynamic",
-    key="editor"
+    hide_index=True,
+    key=editor_key
 )
 
+if "master_saved" in st.session_state:
+    st.sidebar.success(f"Master SW List saved (revision {st.session_state.pop('master_saved')}).")
+
 # === CONDITIONALLY DISPLAY SAVE BUTTON ===
 if 'results_df' in locals() and not results_df.empty:
     if st.sidebar.button("💾 Save Master List"):
-        try:
-            save_master_list(edited_df) # Save the edited state directly
-            st.cache_data.clear() # Clear cache after saving
-            st.rerun() # Rerun script to reflect saved changes
-        except Exception as e:
-            st.error(f"Error saving edits: {e}")
+        # Only the edited rows are committed; the comparison picks up the new revision on the rerun
+        if save_master_list(editable_df, edited_df, st.session_state[editor_key], master_version):
+            st.rerun()
+
+if st.sidebar.button("📤 Export Master List to Excel"):
+    export_master_list(master_df)
+
+# === MASTER LIST HISTORY ===
+master_store = open_master_store(MASTER_LIST_PATH)
+if master_store is not None:
+    with st.sidebar.expander("🕘 Master List History"):
+        history = master_store.history(limit=20)
+        st.dataframe(history, hide_index=True, use_container_width=True)
+
+        label = st.text_input("Snapshot name", key="snapshot_label")
+        if st.button("📌 Save snapshot", disabled=not label):
+            revision = master_store.snapshot(label, author=getpass.getuser())
+            st.success(f"Snapshot '{label}' = revision {revision}")
+
+        if len(history) > 1:
+            restore_options = [f"Revision {r.revision} ({r.saved_at}{', ' + r.snapshots if r.snapshots else ''})"
+                               for r in history.iloc[1:].itertuples()]
+            choice = st.selectbox("Restore an earlier revision", restore_options, key="restore_revision")
+            if st.button("↩️ Restore"):
+                revision = int(history["revision"].iloc[1 + restore_options.index(choice)])
+                st.session_state.master_saved = master_store.restore(revision, author=getpass.getuser())
+                st.rerun()
 
 # === SIDEBAR README ===
 st.sidebar.markdown("---")
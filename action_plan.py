@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import timed
+
+
+# === CONFIGURATION ===
+PRIORITY_SECTIONS = [
+    ("priority_1", "Priority 1: Update Critical Base Vehicle ECUs"),
+    ("priority_2", "Priority 2: Update ADAS ECUs"),
+    ("priority_3", "Priority 3: Update Low Priority Base Vehicle ECUs"),
+]
+PLAN_COLUMNS = {
+    "ECU": "ECU",
+    "🚗Reported Part #": "Reported Part #",
+    "📒Expected Part #": "Expected Part #",
+    "🚗Reported SW": "Reported SW",
+    "📒Expected SW": "Expected SW",
+    "FI Owner": "FI Owner",
+    "Subsystem Owner": "Subsystem Owner",
+}
+NEEDS_UPDATE_STATUSES = ["⚠️ Older", "❌ Not Found"]
+# Columns compare_to_master fills with "N/A" when an ECU has no row in the master list
+MASTER_SIDE_COLUMNS = ["📒Expected Part #", "📒Expected SW", "Priority", "FI Owner", "Subsystem Owner"]
+
+
+# === ACTION PLAN ===
+
+@dataclass(frozen=True)
+class ActionPlan:
+    # Built once per filtered result set; the Streamlit view, HTML/PDF and Excel exports all read it
+    priority_1: pd.DataFrame
+    priority_2: pd.DataFrame
+    priority_3: pd.DataFrame
+    missing: tuple = ()
+    other_no_update: tuple = ()
+
+    def sections(self):
+        # (title, frame) for every priority bucket with ECUs to update, in priority order
+        return [(title, getattr(self, key)) for key, title in PRIORITY_SECTIONS if not getattr(self, key).empty]
+
+    @property
+    def is_empty(self):
+        return not (self.sections() or self.missing or self.other_no_update)
+
+
+@timed("action_plan")
+def generate_action_plan(results_df):
+    if results_df.empty:
+        empty = pd.DataFrame(columns=list(PLAN_COLUMNS.values()))
+        return ActionPlan(empty, empty, empty)
+
+    needs_update = (results_df["Part Status"].isin(NEEDS_UPDATE_STATUSES)
+                    | results_df["SW Status"].isin(NEEDS_UPDATE_STATUSES)).to_numpy()
+    priority = results_df["Priority"]
+    not_in_master = (results_df[MASTER_SIDE_COLUMNS] == "N/A").all(axis=1).to_numpy()
+
+    # Missing priority is treated as critical for now - adjust as needed.
+    # ECUs needing an update with any other priority are left out of the plan.
+    bucket = np.select(
+        [
+            needs_update & ((priority == 1) | priority.isna()).to_numpy(),
+            needs_update & (priority == 2).to_numpy(),
+            needs_update & (priority == 3).to_numpy(),
+            needs_update & not_in_master,
+            ~needs_update & (priority == 0).to_numpy(),
+        ],
+        ["priority_1", "priority_2", "priority_3", "missing", "other_no_update"],
+        default="",
+    )
+
+    plan_rows = results_df[list(PLAN_COLUMNS)].rename(columns=PLAN_COLUMNS)
+    groups = {key: group.reset_index(drop=True) for key, group in plan_rows.groupby(bucket, sort=False)}
+    empty = plan_rows.iloc[0:0].reset_index(drop=True)
+    return ActionPlan(
+        priority_1=groups.get("priority_1", empty),
+        priority_2=groups.get("priority_2", empty),
+        priority_3=groups.get("priority_3", empty),
+        missing=tuple(groups["missing"]["ECU"]) if "missing" in groups else (),
+        other_no_update=tuple(groups["other_no_update"]["ECU"]) if "other_no_update" in groups else (),
+    )
+
+
+def generate_action_plan_html(action_plan):
+    html = """
+    <html>
+    <head>
+        <style>
+            body {font-family: sans-serif;}
+            h2 {color: #333;}
+            h3 {color: #555; margin-top: 1em;}
+            table {width: 100%; border-collapse: collapse;}
+            th, td {border: 1px solid #ddd; padding: 8px; text-align: left;}
+            th {background-color: #f2f2f2;}
+            .priority-1 {background-color: #f8d7da;} /* Light red */
+            .priority-2 {background-color: #fff3cd;} /* Light yellow */
+            .priority-3 {background-color: #d4edda;} /* Light green */
+            .missing {color: red; font-weight: bold;}
+        </style>
+    </head>
+    <body>
+        <h2>Action Plan</h2>
+    """
+
+    for title, section in action_plan.sections():
+        html += f"<h3>{title}</h3>"
+        html += section.to_html(index=False)
+
+    if action_plan.missing:
+        html += "<h3>Missing ECUs</h3>"
+        html += "<p class='missing'>The following ECUs were not found in the Master SW List: " + ", ".join(map(str, action_plan.missing)) + ".</p>"
+
+    if action_plan.other_no_update:
+        html += "<h3>Other ECUs</h3>"
+        html += "<p>The following ECUs do not require updates: " + ", ".join(map(str, action_plan.other_no_update)) + ".</p>"
+
+    html += "</body></html>"
+    return html
@@ -0,0 +1,243 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from action_plan import generate_action_plan, generate_action_plan_html
+from diagnostics import enable_stage_log, stage, summarize_stage_log
+from excel_export import write_excel_report
+from fleet_store import FLEET_STORE_DIR, compact, record_results
+from master_list import MASTER_LIST_PATH, get_master_index
+from vsr_compare import compare_scan
+from results_cache import vsr_digest
+from vsr_parser import PARSER_BACKENDS, parse_vsr
+
+# Headless checker: compare a directory (or glob) of VSRs against the master list.
+#   python batch_check.py "D:\EOL scans\2025-04-14" --output-dir results --workers 8
+
+VSR_EXTENSIONS = (".htm", ".html")
+
+# Set once per worker process by _init_worker so the master index is shipped once, not per file
+_master_index = None
+_parser_backend = "auto"
+_plan_dir = None
+_fleet_dir = None
+
+
+# === FILE DISCOVERY ===
+
+def find_vsr_files(inputs):
+    files = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            matches = (str(p) for p in Path(entry).iterdir() if p.suffix.lower() in VSR_EXTENSIONS)
+        else:
+            matches = glob.glob(entry, recursive=True)
+        files.extend(sorted(matches))
+    # Keep the first occurrence when a file is matched by more than one input
+    return list(dict.fromkeys(files))
+
+
+# === WORKER ===
+
+def _init_worker(master_index, parser_backend, plan_dir, fleet_dir=None):
+    global _master_index, _parser_backend, _plan_dir, _fleet_dir
+    _master_index = master_index
+    _parser_backend = parser_backend
+    _plan_dir = plan_dir
+    _fleet_dir = fleet_dir
+
+
+def output_name(path, digest, suffix):
+    # Per-VSR output file name: inputs from different folders can share a file name, so a short
+    # content hash keeps their outputs apart (the same file checked twice still maps to one name)
+    return f"{Path(path).stem}_{digest[:8]}{suffix}"
+
+
+def check_vsr_file(path):
+    with stage("check_file", file=Path(path).name) as info:
+        result = _check_vsr_file(path)
+        if result[4]:
+            info["error"] = result[4]
+        return result
+
+
+def _check_vsr_file(path):
+    # Returns (path, results_df, ScanSummary, digest, error, seconds); the digest is of the bytes
+    # that were checked, for naming outputs after them
+    start = time.perf_counter()
+    digest = None
+    try:
+        with open(path, "rb") as f:
+            html_content = f.read()
+        digest = vsr_digest(html_content)
+        scan = parse_vsr(html_content, backend=_parser_backend)
+        if scan.ecus.empty:
+            return path, None, None, digest, "No ECU data found in the HTML file.", time.perf_counter() - start
+
+        results_df, summary = compare_scan(scan, _master_index)
+        if _plan_dir:
+            action_plan = generate_action_plan(results_df)
+            plan_path = Path(_plan_dir) / output_name(path, digest, "_action_plan.html")
+            plan_path.write_text(generate_action_plan_html(action_plan), encoding="utf-8")
+        if _fleet_dir:
+            # One file per VSR, so workers never write to the same file
+            record_results(results_df, digest, scan.vehicle, _fleet_dir)
+        return path, results_df, summary, digest, None, time.perf_counter() - start
+    except Exception as e:
+        return path, None, None, digest, f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+
+# === OUTPUT ===
+
+def _parquet_safe(df):
+    # Result columns mix numbers with "N/A"; Arrow needs one type per column
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype("string")
+    return df
+
+
+def write_results(results_df, output_dir, formats):
+    written = []
+    if "excel" in formats:
+        path = Path(output_dir) / "vsr_batch_results.xlsx"
+        write_excel_report(str(path), results_df)
+        written.append(path)
+    if "parquet" in formats:
+        path = Path(output_dir) / "vsr_batch_results.parquet"
+        _parquet_safe(results_df).to_parquet(path, index=False)
+        written.append(path)
+    return written
+
+
+def write_vehicle_summary(vehicles_df, output_dir, formats):
+    # One row per checked VSR, from the ScanSummary counters the workers sent back
+    written = []
+    if "excel" in formats:
+        path = Path(output_dir) / "vsr_batch_vehicles.xlsx"
+        vehicles_df.to_excel(path, index=False, sheet_name="Vehicles")
+        written.append(path)
+    if "parquet" in formats:
+        path = Path(output_dir) / "vsr_batch_vehicles.parquet"
+        _parquet_safe(vehicles_df).to_parquet(path, index=False)
+        written.append(path)
+    return written
+
+
+# === BATCH RUN ===
+
+def file_labels(files):
+    # "File" column values: each path relative to the folder all files share, so same-named VSRs
+    # from different folders stay apart in the consolidated reports
+    paths = [Path(path).resolve() for path in files]
+    try:
+        root = Path(os.path.commonpath([path.parent for path in paths])) if paths else None
+    except ValueError:  # different drives
+        root = None
+    return {path: str(resolved.relative_to(root)) if root else str(resolved) for path, resolved in zip(files, paths)}
+
+
+def run_batch(files, master_path=MASTER_LIST_PATH, output_dir="vsr_batch_output", workers=None,
+              chunksize=4, parser_backend="auto", formats=("excel", "parquet"), action_plans=True, fleet_dir=None,
+              stage_log=None):
+    output_dir = Path(output_dir)
+    plan_dir = output_dir / "action_plans" if action_plans else None
+    (plan_dir or output_dir).mkdir(parents=True, exist_ok=True)
+
+    started_at = datetime.now().isoformat(timespec="milliseconds")
+    if stage_log:
+        enable_stage_log(stage_log)  # before the pool starts, so every worker logs there too
+
+    start = time.perf_counter()
+    master_index = get_master_index(master_path)
+    master_seconds = time.perf_counter() - start
+
+    labels = file_labels(files)
+    frames, vehicles, errors, file_seconds = [], [], {}, []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(master_index, parser_backend, plan_dir, fleet_dir)) as executor:
+        for path, results_df, summary, digest, error, seconds in executor.map(check_vsr_file, files, chunksize=chunksize):
+            file_seconds.append(seconds)
+            if error:
+                errors[path] = error
+                continue
+            results_df.insert(0, "File", labels[path])
+            frames.append(results_df)
+            vehicles.append({"File": labels[path], **summary.as_row()})
+
+    consolidated = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    written = write_results(consolidated, output_dir, formats) if frames else []
+    if vehicles:
+        written += write_vehicle_summary(pd.DataFrame(vehicles), output_dir, formats)
+    if fleet_dir:
+        compact(fleet_dir)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "files": len(files),
+        "checked": len(frames),
+        "failed": len(errors),
+        "ecu_rows": len(consolidated),
+        "workers": workers or os.cpu_count(),
+        "chunksize": chunksize,
+        "master_load_seconds": round(master_seconds, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "files_per_second": round(len(files) / elapsed, 2) if elapsed else None,
+        "mean_file_seconds": round(sum(file_seconds) / len(file_seconds), 4) if file_seconds else None,
+        "outputs": [str(p) for p in written],
+        "errors": errors
+    }
+    if stage_log:
+        # Every process's stages for this run, from the shared JSON-lines log
+        stages = summarize_stage_log([stage_log], since=started_at)
+        report["stages"] = stages.round(4).replace({np.nan: None}).to_dict("records")
+    with open(output_dir / "batch_report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return consolidated, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a directory or glob of VSR HTML files against the Master SW List")
+    parser.add_argument("inputs", nargs="+", help="Directories and/or glob patterns of .htm/.html VSR files")
+    parser.add_argument("--master", default=MASTER_LIST_PATH, help="Master SW List workbook")
+    parser.add_argument("--output-dir", default="vsr_batch_output")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=4, help="Files handed to a worker at a time")
+    parser.add_argument("--parser", choices=PARSER_BACKENDS, default="auto", help="parse_vsr_html backend")
+    parser.add_argument("--format", choices=("excel", "parquet", "both"), default="both")
+    parser.add_argument("--no-action-plans", action="store_true", help="Skip the per-file action plan HTML")
+    parser.add_argument("--fleet", nargs="?", const=str(FLEET_STORE_DIR), default=None, metavar="DIR",
+                        help="Also add every result to the fleet results store (default folder: %(const)s)")
+    parser.add_argument("--stage-log", metavar="FILE",
+                        help="Append per-stage timings as JSON lines (summarized in batch_report.json)")
+    args = parser.parse_args(argv)
+
+    files = find_vsr_files(args.inputs)
+    if not files:
+        parser.error("No VSR files matched the given inputs.")
+    formats = ("excel", "parquet") if args.format == "both" else (args.format,)
+
+    _, report = run_batch(files, args.master, args.output_dir, args.workers, args.chunksize,
+                          args.parser, formats, not args.no_action_plans, args.fleet, args.stage_log)
+
+    print(f"Checked {report['checked']}/{report['files']} files ({report['ecu_rows']} ECU rows) "
+          f"in {report['elapsed_seconds']:.2f} s -> {report['files_per_second']} files/s "
+          f"on {report['workers']} workers")
+    for path, error in report["errors"].items():
+        print(f"  FAILED {path}: {error}")
+    for path in report["outputs"]:
+        print(f"  wrote {path}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
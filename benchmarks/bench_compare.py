@@ -0,0 +1,116 @@
+import argparse
+import time
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from benchmarks.synthetic import make_master_df, make_vsr_html
+from vsr_compare import build_master_index, compare_part_numbers, compare_sw_versions_advanced, compare_to_master
+from vsr_parser import parse_vsr_html
+
+# Scaling benchmark for compare_to_master against the original row-by-row version.
+# Run from the repo root:  python -m benchmarks.bench_compare
+
+
+def compare_to_master_rowwise(vsr_df, master_df):
+    # The pre-vectorization implementation, kept as the reference output
+    results = []
+    for _, row in vsr_df.iterrows():
+        ecu = row["ECU"]
+        reported_part = row.get("Part #")
+        reported_sw = row.get("SW Version")
+        match = master_df[master_df["ECU"] == ecu]
+        if not match.empty:
+            expected_part = match.iloc[0].get("Part #", "N/A")
+            expected_sw = match.iloc[0].get("SW Version", "N/A")
+            priority = match.iloc[0].get("Priority", "N/A")
+            fi_owner = match.iloc[0].get("FI Owner", "N/A")
+            subsystem_owner = match.iloc[0].get("Subsystem Owner", "N/A")
+
+            if reported_part is None or pd.isna(reported_part) or str(reported_part).strip() == "":
+                part_status = "❌ Not Found"
+            else:
+                part_status = compare_part_numbers(reported_part, expected_part)
+
+            if reported_sw is None or pd.isna(reported_sw) or str(reported_sw).strip() == "":
+                sw_status = "❌ Not Found"
+            else:
+                sw_status = compare_sw_versions_advanced(reported_sw, expected_sw)
+        else:
+            expected_part = expected_sw = priority = fi_owner = subsystem_owner = "N/A"
+            part_status = sw_status = "❌ Not Found"
+
+        results.append({
+            "ECU": ecu,
+            "🚗Reported Part #": reported_part,
+            "📒Expected Part #": expected_part,
+            "Part Status": part_status,
+            "🚗Reported SW": reported_sw,
+            "📒Expected SW": expected_sw,
+            "SW Status": sw_status,
+            "Priority": priority,
+            "FI Owner": fi_owner,
+            "Subsystem Owner": subsystem_owner
+        })
+    return pd.DataFrame(results)
+
+
+def _best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(master_sizes, vsr_sizes, repeat, rowwise_limit):
+    print(f"{'master rows':>11} {'VSR rows':>9} {'rowwise (s)':>12} {'vectorized (s)':>15} {'speedup':>8}")
+    for master_rows in master_sizes:
+        master_df = make_master_df(master_rows)
+        for vsr_rows in vsr_sizes:
+            vsr_df = parse_vsr_html(make_vsr_html(ecu_count=vsr_rows, version_formats=("dotted", "prefixed", "plain")))
+            vectorized = _best_of(lambda: compare_to_master(vsr_df, master_df), repeat)
+            if master_rows * vsr_rows <= rowwise_limit:
+                # Same values; the vectorized statuses are categoricals where the reference has strings
+                vectorized_df = compare_to_master(vsr_df, master_df).astype({"Part Status": object, "SW Status": object})
+                assert_frame_equal(vectorized_df, compare_to_master_rowwise(vsr_df, master_df))
+                rowwise = _best_of(lambda: compare_to_master_rowwise(vsr_df, master_df), 1)
+                print(f"{master_rows:>11} {vsr_rows:>9} {rowwise:>12.3f} {vectorized:>15.4f} {rowwise / vectorized:>7.0f}x")
+            else:
+                print(f"{master_rows:>11} {vsr_rows:>9} {'skipped':>12} {vectorized:>15.4f} {'':>8}")
+
+
+def run_shift(master_rows, scans, ecus_per_scan):
+    # A shift's worth of scans against one master list: rebuilding the index per scan
+    # versus normalizing the master once and reusing it
+    master_df = make_master_df(master_rows)
+    vsrs = [parse_vsr_html(make_vsr_html(ecu_count=ecus_per_scan, seed=i,
+                                         version_formats=("dotted", "prefixed", "plain")))
+            for i in range(scans)]
+    start = time.perf_counter()
+    for vsr_df in vsrs:
+        compare_to_master(vsr_df, master_df)
+    per_scan = time.perf_counter() - start
+    start = time.perf_counter()
+    master_index = build_master_index(master_df)
+    for vsr_df in vsrs:
+        compare_to_master(vsr_df, master_index)
+    indexed = time.perf_counter() - start
+    print(f"\n{scans} scans x {ecus_per_scan} ECUs vs {master_rows} master rows: "
+          f"index per scan {per_scan:.2f} s, shared index {indexed:.2f} s ({per_scan / indexed:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark compare_to_master scaling")
+    parser.add_argument("--master-sizes", type=int, nargs="+", default=[500, 10_000, 100_000])
+    parser.add_argument("--vsr-sizes", type=int, nargs="+", default=[100, 1_000, 5_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rowwise-limit", type=int, default=50_000_000,
+                        help="Skip the slow reference when master rows x VSR rows exceeds this")
+    parser.add_argument("--shift-scans", type=int, default=300,
+                        help="Scans in the shared-master scenario (0 to skip)")
+    args = parser.parse_args()
+    run(args.master_sizes, args.vsr_sizes, args.repeat, args.rowwise_limit)
+    if args.shift_scans:
+        run_shift(10_000, args.shift_scans, 120)
@@ -0,0 +1,69 @@
+import argparse
+import multiprocessing
+import time
+import tracemalloc
+
+from pandas.testing import assert_frame_equal
+
+from benchmarks.synthetic import make_vsr_html
+from vsr_parser import parse_vsr_html
+
+# Compare parse_vsr_html backends on large synthetic VSRs.
+# Run from the repo root:  python -m benchmarks.bench_parse --sizes 1024 4096
+
+
+def _rss_kb(field):
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return 0
+
+
+def _measure(html, backend, repeat):
+    # Runs in a fresh process so the RSS high-water mark belongs to this backend only.
+    # tracemalloc only sees Python allocations (not lxml's C heap), so both are reported.
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_vsr_html(html, backend=backend)
+        timings.append(time.perf_counter() - start)
+
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")  # reset VmHWM to the current RSS (Linux only)
+    rss_before = _rss_kb("VmRSS")
+    tracemalloc.start()
+    parse_vsr_html(html, backend=backend)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_peak = _rss_kb("VmHWM")
+    return min(timings), (rss_peak - rss_before) / 1024, py_peak / 2**20
+
+
+def run(sizes_kb, ecu_count, repeat, position):
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'size':>8} {'backend':>9} {'best (s)':>9} {'speedup':>8} {'peak RSS +MB':>13} {'py peak MB':>11}")
+    for size_kb in sizes_kb:
+        html = make_vsr_html(ecu_count=ecu_count, padding_kb=size_kb,
+                             ecu_table_position=position).encode("utf-8")
+        reference = parse_vsr_html(html, backend="soup")
+        baseline = None
+        for backend in ("soup", "strainer", "lxml"):
+            assert_frame_equal(parse_vsr_html(html, backend=backend), reference)
+            with ctx.Pool(1) as pool:
+                best, rss_mb, py_mb = pool.apply(_measure, (html, backend, repeat))
+            baseline = baseline or best
+            print(f"{len(html) / 2**20:>6.1f}MB {backend:>9} {best:>9.3f} {baseline / best:>7.1f}x "
+                  f"{rss_mb:>13.1f} {py_mb:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parse_vsr_html backends")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 2048, 8192],
+                        help="Diagnostic padding per VSR, in KB")
+    parser.add_argument("--ecus", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--position", choices=("top", "bottom"), default="top",
+                        help="Where the ECU table sits in the page")
+    args = parser.parse_args()
+    run(args.sizes, args.ecus, args.repeat, args.position)
@@ -0,0 +1,155 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from action_plan import generate_action_plan
+from benchmarks.synthetic import VERSION_FORMATS, make_master_df, make_vsr_html
+from excel_export import excel_report_bytes
+from styling import highlight_status
+from vsr_compare import build_master_index, compare_to_master
+from vsr_parser import parse_vsr_html
+
+# Times and memory-profiles each stage of the VSR pipeline on synthetic data and stores the
+# numbers as JSON, so two versions can be compared stage by stage.
+# Run from the repo root:
+#   python -m benchmarks.bench_pipeline                                  # writes benchmarks/results/<commit>.json
+#   python -m benchmarks.bench_pipeline --baseline benchmarks/results/abc1234.json
+
+# === CONFIGURATION ===
+RESULTS_DIR = Path(__file__).parent / "results"
+STAGES = ["parse", "master_index", "compare", "highlight_status", "action_plan", "excel_export"]
+DEFAULT_TOLERANCE = 0.25  # a stage more than 25% slower than the baseline counts as a regression
+
+
+# === STAGES ===
+# Each stage gets the previous stages' outputs, the same way the app chains them
+
+def _stage_calls(html, master_df):
+    vsr_df = parse_vsr_html(html)
+    master_index = build_master_index(master_df)
+    results_df = compare_to_master(vsr_df, master_index)
+    action_plan = generate_action_plan(results_df)
+    return {
+        "parse": lambda: parse_vsr_html(html),
+        "master_index": lambda: build_master_index(master_df),
+        "compare": lambda: compare_to_master(vsr_df, master_index),
+        # Both the CSS frame and the Styler render of it, as the results table does
+        "highlight_status": lambda: results_df.style.apply(highlight_status, axis=None).to_html(),
+        "action_plan": lambda: generate_action_plan(results_df),
+        "excel_export": lambda: excel_report_bytes(results_df, action_plan),
+    }, len(vsr_df)
+
+
+def _measure(func, repeat):
+    # Timings first, then one traced run: tracemalloc slows the code it watches. The peak counts
+    # Python and NumPy allocations, not C libraries' own heaps (lxml's parse tree).
+    func()  # warm-up: imports, caches, first-call setup
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"best_s": min(timings), "median_s": statistics.median(timings), "peak_mb": peak / 2**20}
+
+
+# === RUN ===
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(ecu_counts, master_sizes, repeat, no_response_ratio, version_formats, padding_kb, stages):
+    results = []
+    print(f"{'ECUs':>6} {'master':>7} {'stage':>17} {'best (s)':>9} {'median (s)':>11} {'peak MB':>8}")
+    for master_rows in master_sizes:
+        master_df = make_master_df(master_rows)
+        for ecu_count in ecu_counts:
+            html = make_vsr_html(ecu_count=ecu_count, no_response_ratio=no_response_ratio,
+                                 version_formats=version_formats, padding_kb=padding_kb).encode("utf-8")
+            calls, vsr_rows = _stage_calls(html, master_df)
+            for stage in stages:
+                measured = _measure(calls[stage], repeat)
+                results.append({"ecus": ecu_count, "master_rows": master_rows, "vsr_rows": vsr_rows,
+                                "html_kb": round(len(html) / 1024, 1), "stage": stage, **measured})
+                print(f"{ecu_count:>6} {master_rows:>7} {stage:>17} {measured['best_s']:>9.4f} "
+                      f"{measured['median_s']:>11.4f} {measured['peak_mb']:>8.1f}")
+    return results
+
+
+def compare_runs(results, baseline, tolerance):
+    # Stage-by-stage best times against a previous run's JSON; returns the regressed rows
+    key = lambda row: (row["ecus"], row["master_rows"], row["stage"])
+    previous = {key(row): row for row in baseline["results"]}
+    regressions = []
+    print(f"\nAgainst {baseline.get('label')} ({baseline.get('created')}):")
+    print(f"{'ECUs':>6} {'master':>7} {'stage':>17} {'before (s)':>11} {'now (s)':>9} {'change':>8} {'peak MB':>13}")
+    for row in results:
+        old = previous.get(key(row))
+        if old is None:
+            continue
+        change = row["best_s"] / old["best_s"] - 1 if old["best_s"] else 0.0
+        flag = " <-- slower" if change > tolerance else ""
+        print(f"{row['ecus']:>6} {row['master_rows']:>7} {row['stage']:>17} {old['best_s']:>11.4f} "
+              f"{row['best_s']:>9.4f} {change:>+7.0%} {old['peak_mb']:>6.1f}->{row['peak_mb']:<6.1f}{flag}")
+        if flag:
+            regressions.append(row)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the VSR pipeline")
+    parser.add_argument("--ecus", type=int, nargs="+", default=[120, 1_000], help="ECU rows per synthetic VSR")
+    parser.add_argument("--master-sizes", type=int, nargs="+", default=[500, 10_000])
+    parser.add_argument("--no-response", type=float, default=0.1,
+                        help="Share of ECUs reported as \"No positive response\"")
+    parser.add_argument("--version-formats", nargs="+", choices=VERSION_FORMATS, default=list(VERSION_FORMATS),
+                        help="SW version formats mixed into the VSRs")
+    parser.add_argument("--padding-kb", type=int, default=0, help="Diagnostic sections added around the ECU table")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--label", help="Name of this run (default: the current git commit)")
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<label>.json)")
+    parser.add_argument("--baseline", help="Earlier JSON run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown (0.25 = 25%%) that counts as a regression")
+    args = parser.parse_args()
+
+    label = args.label or _git_commit() or datetime.now().strftime("%Y%m%d-%H%M%S")
+    results = run(args.ecus, args.master_sizes, args.repeat, args.no_response, tuple(args.version_formats),
+                  args.padding_kb, args.stages)
+    report = {
+        "label": label,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "label")},
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{label}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nWrote {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare_runs(results, baseline, args.tolerance)
+        print(f"{len(regressions)} stage(s) more than {args.tolerance:.0%} slower" if regressions else "No regressions")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+from benchmarks.synthetic import make_vsr_html
+
+# Load test for check_api.py: keeps --concurrency requests in flight against a running instance
+# and reports requests/s and latency percentiles.
+#   python check_api.py --workers 4 &
+#   python -m benchmarks.load_check_api --requests 500 --concurrency 16
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+async def _run(url, bodies, total, concurrency, include_results):
+    client = AsyncHTTPClient(max_clients=concurrency)
+    target = f"{url.rstrip('/')}/check?results={1 if include_results else 0}"
+    latencies, errors = [], 0
+    next_request = 0
+
+    async def worker():
+        nonlocal next_request, errors
+        while next_request < total:
+            body = bodies[next_request % len(bodies)]
+            next_request += 1
+            start = time.perf_counter()
+            try:
+                await client.fetch(target, method="POST", body=body, request_timeout=120)
+            except HTTPClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+def run(url, bodies, total, concurrency, include_results, warmup):
+    if warmup:
+        asyncio.run(_run(url, bodies, warmup, concurrency, include_results))
+    elapsed, latencies, errors = asyncio.run(_run(url, bodies, total, concurrency, include_results))
+    report = {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(total / elapsed, 2),
+        "latency_p50_ms": round(1000 * _percentile(latencies, 0.50), 1),
+        "latency_p95_ms": round(1000 * _percentile(latencies, 0.95), 1),
+        "latency_p99_ms": round(1000 * _percentile(latencies, 0.99), 1),
+        "latency_mean_ms": round(1000 * statistics.mean(latencies), 1),
+    }
+    print(f"{total} requests, {concurrency} concurrent: {report['requests_per_second']} req/s, "
+          f"p50 {report['latency_p50_ms']} ms, p95 {report['latency_p95_ms']} ms, "
+          f"p99 {report['latency_p99_ms']} ms, {errors} errors")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a running check_api.py instance")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16],
+                        help="In-flight requests; several values run one test each")
+    parser.add_argument("--ecus", type=int, default=120, help="ECU rows per synthetic VSR")
+    parser.add_argument("--variants", type=int, default=20, help="Different synthetic VSRs to cycle through")
+    parser.add_argument("--files", nargs="+", help="Send these VSR files instead of synthetic ones")
+    parser.add_argument("--summary-only", action="store_true", help="Ask for ?results=0 (no per-ECU rows)")
+    parser.add_argument("--warmup", type=int, default=20, help="Requests sent before measuring")
+    parser.add_argument("--output", help="Write the reports as JSON to this file")
+    args = parser.parse_args()
+
+    if args.files:
+        bodies = [Path(path).read_bytes() for path in args.files]
+    else:
+        bodies = [make_vsr_html(ecu_count=args.ecus, seed=i, version_formats=("dotted", "prefixed", "plain")).encode()
+                  for i in range(args.variants)]
+    reports = [run(args.url, bodies, args.requests, concurrency, not args.summary_only, args.warmup)
+               for concurrency in args.concurrency]
+    if args.output:
+        Path(args.output).write_text(json.dumps(reports, indent=2), encoding="utf-8")
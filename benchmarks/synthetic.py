@@ -0,0 +1,115 @@
+import random
+
+import pandas as pd
+
+# === SYNTHETIC VSR GENERATION ===
+# Produces HTML shaped like a scan-tool export: a vehicle header, the
+# ecuInformationTable and (optionally large) diagnostic sections around it.
+
+VERSION_FORMATS = ("dotted", "prefixed", "plain")
+
+
+def ecu_names(count):
+    return [f"ECU_{i:04d}" for i in range(count)]
+
+
+def make_part_number(rng):
+    return f"68{rng.randint(100000, 999999)}{rng.choice('ABCDEFGH')}{rng.choice('ABCDEFGH')}"
+
+
+def make_sw_version(rng, fmt="dotted"):
+    major, minor, patch = rng.randint(1, 30), rng.randint(0, 99), rng.randint(0, 99)
+    if fmt == "prefixed":
+        return f"SW {major}.{minor}.{patch} (build {rng.randint(1, 999)})"
+    if fmt == "plain":
+        return f"{major:02d}{minor:02d}{rng.choice('ABCDEFGH')}"
+    return f"{major}.{minor}.{patch}"
+
+
+def _ecu_row(rng, name, version_formats):
+    part = make_part_number(rng)
+    sw = make_sw_version(rng, rng.choice(version_formats))
+    hw = make_part_number(rng)
+    return (
+        "<tr>"
+        f"<td>{name}</td><td>0x{rng.randint(0x700, 0x7FF):03X}</td><td>{hw}</td>"
+        f"<td> {part} </td><td>{rng.randint(1, 9)}</td><td>Supplier {rng.randint(1, 40)}</td>"
+        f"<td>{make_sw_version(rng)}</td><td>{sw}</td>"
+        "</tr>\n"
+    )
+
+
+def _no_response_row(name):
+    return f"<tr><td>{name}</td><td colspan=\"7\">No positive response from ECU</td></tr>\n"
+
+
+def _diagnostic_section(rng, index, rows):
+    body = "".join(
+        f"<tr><td>DTC {index}-{r}</td><td>U{rng.randint(0, 0x3FFF):04X}</td>"
+        f"<td>{'Active' if rng.random() < 0.2 else 'Stored'}</td>"
+        f"<td>Lorem ipsum diagnostic freeze frame data {rng.random():.8f}</td></tr>\n"
+        for r in range(rows)
+    )
+    return f"<h3>Diagnostic block {index}</h3>\n<table class=\"dtc\">\n{body}</table>\n"
+
+
+def make_vsr_html(ecu_count=80, no_response_ratio=0.1, version_formats=("dotted",),
+                  padding_kb=0, ecu_table_position="top", vin="1C4RJFBG0MC000001", seed=0):
+    rng = random.Random(seed)
+    names = ecu_names(ecu_count)
+    rows = "".join(
+        _no_response_row(name) if rng.random() < no_response_ratio else _ecu_row(rng, name, version_formats)
+        for name in names
+    )
+    ecu_table = (
+        "<table id=\"ecuInformationTable\">\n"
+        "<tr><th>ECU</th><th>Address</th><th>HW Part #</th><th>Part #</th><th>Variant</th>"
+        "<th>Supplier</th><th>Boot SW</th><th>SW Version</th></tr>\n"
+        f"{rows}</table>\n"
+    )
+
+    padding = []
+    size = 0
+    index = 0
+    while size < padding_kb * 1024:
+        section = _diagnostic_section(rng, index, 50)
+        padding.append(section)
+        size += len(section)
+        index += 1
+    padding = "".join(padding)
+
+    header = (
+        "<html><head><meta charset=\"utf-8\"><title>Vehicle Scan Report</title></head><body>\n"
+        "<table id=\"vehicleInformationTable\">\n"
+        f"<tr><td>VIN</td><td>{vin}</td></tr>\n"
+        "<tr><td>Model Year</td><td>2025</td></tr>\n"
+        "<tr><td>Body</td><td>WL</td></tr>\n"
+        "</table>\n"
+    )
+    if ecu_table_position == "bottom":
+        return header + padding + ecu_table + "</body></html>"
+    return header + ecu_table + padding + "</body></html>"
+
+
+# === SYNTHETIC MASTER LIST GENERATION ===
+
+def make_master_df(row_count=500, duplicate_ratio=0.05, blank_ratio=0.02, seed=1):
+    # ECU names line up with make_vsr_html's, so a VSR with fewer ECUs than the master
+    # mostly hits. Some ECUs repeat so first-row-wins matters.
+    rng = random.Random(seed)
+    names = ecu_names(row_count)
+    rows = []
+    for name in names:
+        copies = 2 if rng.random() < duplicate_ratio else 1
+        for _ in range(copies):
+            blank = rng.random() < blank_ratio
+            rows.append({
+                "ECU": name,
+                "Part #": None if blank else make_part_number(rng),
+                "SW Version": None if blank else make_sw_version(rng, rng.choice(VERSION_FORMATS)),
+                "Priority": rng.choice([0, 1, 2, 3]),
+                "FI Owner": f"Owner {rng.randint(1, 25)}",
+                "Subsystem Owner": f"Subsystem {rng.randint(1, 12)}"
+            })
+    rng.shuffle(rows)
+    return pd.DataFrame(rows[:row_count])
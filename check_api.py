@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import tornado.web
+
+from action_plan import NEEDS_UPDATE_STATUSES
+from diagnostics import enable_stage_log, record_stage
+from fleet_store import FLEET_STORE_DIR, record_results
+from master_list import MASTER_LIST_PATH, get_master, master_list_version
+from results_cache import vsr_digest
+from vsr_compare import compare_scan
+from vsr_parser import PARSER_BACKENDS, parse_vsr
+
+# Local HTTP API for test-bench automation: post a VSR, get the comparison back as JSON.
+#   python check_api.py --port 8765 --workers 4
+#   curl --data-binary @scan.htm "http://127.0.0.1:8765/check?name=scan.htm"
+#   curl -F files=@a.htm -F files=@b.htm http://127.0.0.1:8765/batch
+
+# === CONFIGURATION ===
+DEFAULT_PORT = 8765
+MASTER_CHECK_SECONDS = 1.0  # the master list version is checked at most this often
+MAX_BODY_MB = 200
+BROKEN_POOL_RETRIES = 1  # a request whose pool broke under it is resubmitted to the new pool this often
+
+log = logging.getLogger("vsr_check_api")
+
+
+# === WORKER ===
+# Runs in the pool processes. The master index is shipped once per process by the initializer,
+# so a request only sends the VSR bytes and gets plain JSON-ready data back.
+
+_master_index = None
+_parser_backend = "auto"
+_fleet_dir = None
+
+
+def _init_api_worker(master_index, parser_backend, fleet_dir):
+    global _master_index, _parser_backend, _fleet_dir
+    _master_index = master_index
+    _parser_backend = parser_backend
+    _fleet_dir = fleet_dir
+
+
+def check_vsr_content(html_content, name, digest, include_results=True):
+    start = time.perf_counter()
+    scan = parse_vsr(html_content, backend=_parser_backend)
+    if scan.ecus.empty:
+        return {"file": name, "sha256": digest, "vehicle": scan.vehicle, "error": "No ECU data found in the HTML file."}
+
+    results_df, summary = compare_scan(scan, _master_index)
+    if _fleet_dir:
+        record_results(results_df, digest, scan.vehicle, _fleet_dir)
+    needs_update = results_df["Part Status"].isin(NEEDS_UPDATE_STATUSES) | results_df["SW Status"].isin(NEEDS_UPDATE_STATUSES)
+    response = {
+        "file": name,
+        "sha256": digest,
+        "vehicle": scan.vehicle,
+        "ecus": summary.ecus,
+        "responding": summary.responding,
+        "in_master": summary.in_master,
+        "coverage_percent": summary.coverage,
+        "part_status": summary.part_status,
+        "sw_status": summary.sw_status,
+        "part_match_percent": summary.part_match_rate,
+        "sw_match_percent": summary.sw_match_rate,
+        "needs_update": results_df.loc[needs_update, "ECU"].tolist(),
+    }
+    if include_results:
+        # to_json turns NaN into null and NumPy scalars into plain numbers
+        response["results"] = json.loads(results_df.to_json(orient="records", force_ascii=False))
+    response["seconds"] = round(time.perf_counter() - start, 4)
+    return response
+
+
+# === SERVICE ===
+
+class CheckService:
+    # Owns the worker pool and the resident master index. The version of the master list is
+    # checked at most every MASTER_CHECK_SECONDS; when it changes, a new pool is started with the
+    # new index and the old one finishes the requests it already has.
+
+    def __init__(self, master_path=MASTER_LIST_PATH, workers=None, parser_backend="auto", fleet_dir=None):
+        self.master_path = master_path
+        self.workers = workers or os.cpu_count()
+        self.parser_backend = parser_backend
+        self.fleet_dir = fleet_dir
+        self.master_version = None
+        self.master_rows = 0
+        self._executor = None
+        self._checked_at = 0.0
+        self._reload_lock = asyncio.Lock()
+        self.requests = 0
+        self.failed = 0
+
+    def _start_pool(self):
+        # Blocking (reads the master list); called off the event loop
+        master_df, master_index, version = get_master(self.master_path)
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_api_worker,
+                                       initargs=(master_index, self.parser_backend, self.fleet_dir))
+        old, self._executor = self._executor, executor
+        self.master_version, self.master_rows = version, len(master_df)
+        if old is not None:
+            old.shutdown(wait=False)
+        log.info("Worker pool started (%d workers, master list version %s)", self.workers, version)
+
+    async def executor(self):
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        if self._executor is not None and now - self._checked_at < MASTER_CHECK_SECONDS:
+            return self._executor
+        async with self._reload_lock:
+            if self._executor is None or time.monotonic() - self._checked_at >= MASTER_CHECK_SECONDS:
+                try:
+                    current = await loop.run_in_executor(None, master_list_version, self.master_path)
+                except OSError as e:
+                    # Share unreachable: keep serving with the index already loaded (as the watcher does)
+                    if self._executor is None:
+                        raise
+                    log.warning("Master list not reachable, keeping the current index: %s", e)
+                    self._checked_at = time.monotonic()
+                    return self._executor
+                if current != self.master_version:
+                    await loop.run_in_executor(None, self._start_pool)
+                self._checked_at = time.monotonic()
+        return self._executor
+
+    async def _restart_broken(self, broken):
+        # A dead worker (OOM on a huge VSR, a crash in lxml) breaks the whole pool; the first
+        # request to notice starts a new one, the others then find it already replaced
+        async with self._reload_lock:
+            if self._executor is broken:
+                log.warning("Worker pool broke, restarting it")
+                await asyncio.get_running_loop().run_in_executor(None, self._start_pool)
+                self._checked_at = time.monotonic()
+
+    async def check(self, html_content, name, include_results=True):
+        digest = vsr_digest(html_content)
+        self.requests += 1
+        for _ in range(BROKEN_POOL_RETRIES + 1):
+            executor = await self.executor()
+            try:
+                response = await asyncio.wrap_future(
+                    executor.submit(check_vsr_content, html_content, name, digest, include_results))
+                break
+            except BrokenProcessPool as e:
+                response = {"file": name, "sha256": digest, "error": f"{type(e).__name__}: {e}"}
+                await self._restart_broken(executor)
+            except Exception as e:
+                response = {"file": name, "sha256": digest, "error": f"{type(e).__name__}: {e}"}
+                break
+        if "error" in response:
+            self.failed += 1
+        return response
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+# === HANDLERS ===
+
+class _BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def write_json(self, payload, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps(payload, ensure_ascii=False, default=str))
+
+    def include_results(self):
+        return self.get_query_argument("results", "1") not in ("0", "false", "no")
+
+
+class HealthHandler(_BaseHandler):
+    async def get(self):
+        await self.service.executor()
+        self.write_json({"status": "ok", "master_version": self.service.master_version,
+                         "master_rows": self.service.master_rows, "workers": self.service.workers,
+                         "requests": self.service.requests, "failed": self.service.failed})
+
+
+class CheckHandler(_BaseHandler):
+    # POST the raw VSR HTML as the request body; ?name= labels it, ?results=0 returns the summary only
+    async def post(self):
+        if not self.request.body:
+            return self.write_json({"error": "Send the VSR HTML as the request body."}, 400)
+        start = time.perf_counter()
+        try:
+            response = await self.service.check(self.request.body, self.get_query_argument("name", None),
+                                                self.include_results())
+        finally:
+            record_stage("api_check", time.perf_counter() - start)
+        self.write_json(response, 422 if "error" in response else 200)
+
+
+class BatchHandler(_BaseHandler):
+    # multipart/form-data with any number of files; all of them are checked concurrently
+    async def post(self):
+        files = [f for uploads in self.request.files.values() for f in uploads]
+        if not files:
+            return self.write_json({"error": "Send the VSR files as multipart/form-data."}, 400)
+        include_results = self.include_results()
+        start = time.perf_counter()
+        try:
+            responses = await asyncio.gather(*(self.service.check(f["body"], f["filename"], include_results)
+                                               for f in files))
+        finally:
+            record_stage("api_batch", time.perf_counter() - start, files=len(files))
+        failed = sum("error" in response for response in responses)
+        self.write_json({"files": len(files), "checked": len(files) - failed, "failed": failed, "results": responses})
+
+
+def make_app(service):
+    return tornado.web.Application([
+        (r"/health", HealthHandler, {"service": service}),
+        (r"/check", CheckHandler, {"service": service}),
+        (r"/batch", BatchHandler, {"service": service}),
+    ])
+
+
+# === CLI ===
+
+async def serve(args):
+    service = CheckService(args.master, args.workers, args.parser, args.fleet)
+    await service.executor()  # load the master list before taking requests
+    app = make_app(service)
+    app.listen(args.port, args.host, max_body_size=MAX_BODY_MB * 2**20)
+    log.info("Listening on http://%s:%d", args.host, args.port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        service.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP API that checks VSRs against the Master SW List")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: local only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--master", default=MASTER_LIST_PATH, help="Master SW List workbook")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--parser", choices=PARSER_BACKENDS, default="auto", help="parse_vsr_html backend")
+    parser.add_argument("--fleet", nargs="?", const=str(FLEET_STORE_DIR), default=None, metavar="DIR",
+                        help="Also add every result to the fleet results store (default folder: %(const)s)")
+    parser.add_argument("--stage-log", metavar="FILE", help="Append per-stage timings of every worker as JSON lines")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.stage_log:
+        enable_stage_log(args.stage_log)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,209 @@
+import argparse
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# === CONFIGURATION ===
+STAGE_LOGGER = "vsr_checker.stages"
+# JSON-lines file every process appends its stage records to; set by --stage-log in the batch
+# paths so worker processes (which import this module fresh) log to the same file
+STAGE_LOG_ENV = "VSR_CHECKER_STAGE_LOG"
+TRACE_MEMORY_ENV = "VSR_CHECKER_TRACE_MEMORY"
+
+log = logging.getLogger(STAGE_LOGGER)
+log.setLevel(logging.INFO)
+log.propagate = False  # stage lines only go to the JSON log, never to the console
+
+
+# === STAGE RECORDS ===
+# Per-process totals for every stage: calls, wall time, peak traced memory, cache hits/misses
+# and errors. Each finished stage is also written as one JSON line when a stage log is open.
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(name, seconds, peak_mb, fields):
+    with _stats_lock:
+        entry = _stats.setdefault(name, {"calls": 0, "total_s": 0.0, "max_s": 0.0, "last_s": 0.0, "peak_mb": None,
+                                         "cache_hits": 0, "cache_misses": 0, "errors": 0})
+        entry["calls"] += 1
+        entry["total_s"] += seconds
+        entry["max_s"] = max(entry["max_s"], seconds)
+        entry["last_s"] = seconds
+        if peak_mb is not None:
+            entry["peak_mb"] = max(entry["peak_mb"] or 0.0, peak_mb)
+        if fields.get("cache") == "hit":
+            entry["cache_hits"] += 1
+        elif fields.get("cache") == "miss":
+            entry["cache_misses"] += 1
+        if "error" in fields:
+            entry["errors"] += 1
+    if log.handlers:
+        line = {"ts": datetime.now().isoformat(timespec="milliseconds"), "stage": name, "seconds": round(seconds, 6),
+                "peak_mb": None if peak_mb is None else round(peak_mb, 3), "pid": os.getpid(), **fields}
+        log.info(json.dumps(line, default=str))
+
+
+_open = threading.local()  # stages open on this thread, innermost last
+
+
+@contextmanager
+def stage(name, **fields):
+    # with stage("parse", file=name) as info: ...  -- callers may add fields to `info`, e.g.
+    # info["cache"] = "hit". Peak memory is only measured while tracemalloc is running; the peak
+    # is process-wide, so stages running at the same time on other threads share it. Each stage
+    # resets the peak on entry; the peak its enclosing stage had reached so far is kept in
+    # `carried` and folded back in when the nested stage exits.
+    info = dict(fields)
+    if not hasattr(_open, "stack"):
+        _open.stack = []
+    stack = _open.stack
+    tracing = tracemalloc.is_tracing()
+    frame = {"carried": 0}
+    if tracing:
+        start_memory, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]["carried"] = max(stack[-1]["carried"], peak)
+        tracemalloc.reset_peak()
+        frame["carried"] = start_memory
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield info
+    except BaseException as e:
+        info["error"] = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        # Tracing switched off mid-stage leaves nothing to measure against
+        if tracing and tracemalloc.is_tracing():
+            peak = max(frame["carried"], tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]["carried"] = max(stack[-1]["carried"], peak)
+            peak_mb = (peak - start_memory) / 2**20
+        else:
+            peak_mb = None
+        _record(name, seconds, peak_mb, info)
+
+
+def record_stage(name, seconds, **fields):
+    # Wall time only, for work that can't hold a stage() open on its thread: coroutines awaiting on
+    # the event loop interleave, so they would nest inside each other's stages
+    _record(name, seconds, None, fields)
+
+
+def timed(name):
+    # Decorator form of stage()
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stage_stats():
+    with _stats_lock:
+        rows = [{"stage": name, **entry} for name, entry in _stats.items()]
+    df = pd.DataFrame(rows, columns=["stage", "calls", "total_s", "max_s", "last_s", "peak_mb", "cache_hits",
+                                     "cache_misses", "errors"])
+    df.insert(3, "mean_s", df["total_s"] / df["calls"])
+    return df.sort_values("total_s", ascending=False, ignore_index=True)
+
+
+def reset_stage_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# === SWITCHES ===
+
+def set_memory_tracing(enabled):
+    # tracemalloc slows every allocation, so it is off unless asked for
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def log_stages_to(path):
+    # Append this process's stage records to a JSON-lines file (once per path)
+    path = os.path.abspath(path)
+    if any(getattr(handler, "baseFilename", None) == path for handler in log.handlers):
+        return
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+
+
+def enable_stage_log(path):
+    # For the batch paths: log here and in every worker process started afterwards
+    os.environ[STAGE_LOG_ENV] = os.path.abspath(path)
+    log_stages_to(path)
+
+
+if os.environ.get(STAGE_LOG_ENV):
+    log_stages_to(os.environ[STAGE_LOG_ENV])
+if os.environ.get(TRACE_MEMORY_ENV) == "1":
+    set_memory_tracing(True)
+
+
+# === LOG AGGREGATION ===
+
+def summarize_stage_log(paths, since=None):
+    # Per-stage totals and percentiles from one or more JSON-lines stage logs (all processes).
+    # since: ISO timestamp; earlier records are skipped (logs are appended to across runs).
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    if since is not None:
+        records = [record for record in records if record["ts"] >= since]
+    columns = ["stage", "calls", "total_s", "mean_s", "p50_s", "p95_s", "max_s", "peak_mb", "cache_hit_rate", "errors"]
+    if not records:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame.from_records(records)
+    for col in ("cache", "error", "peak_mb"):
+        if col not in df:
+            df[col] = None
+    grouped = df.groupby("stage", sort=False)
+    seconds = grouped["seconds"]
+    summary = pd.DataFrame({
+        "calls": seconds.size(),
+        "total_s": seconds.sum(),
+        "mean_s": seconds.mean(),
+        "p50_s": seconds.quantile(0.50),
+        "p95_s": seconds.quantile(0.95),
+        "max_s": seconds.max(),
+        "peak_mb": grouped["peak_mb"].max(),
+        "cache_hit_rate": grouped["cache"].apply(lambda c: (c == "hit").sum() / c.notna().sum() if c.notna().any() else None),
+        "errors": grouped["error"].count(),
+    })
+    return summary.reset_index().sort_values("total_s", ascending=False, ignore_index=True)[columns]
+
+
+# === CLI ===
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize JSON-lines stage logs from the app or the batch paths")
+    parser.add_argument("logs", nargs="+", help="Stage log files (written with --stage-log)")
+    parser.add_argument("--since", help="Only records from this time on (e.g. 2025-04-14T06:00)")
+    args = parser.parse_args(argv)
+    summary = summarize_stage_log(args.logs, args.since)
+    print(summary.round(4).to_string(index=False) if not summary.empty else "No stage records")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
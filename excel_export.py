@@ -0,0 +1,116 @@
+from io import BytesIO
+
+import pandas as pd
+
+from diagnostics import timed
+from styling import STATUS_COLORS, STATUS_COLUMN_GROUPS
+
+# === CONFIGURATION ===
+MAX_COLUMN_WIDTH = 50
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+# === SHEET WRITERS ===
+# Rows are streamed in order so the workbook can run in xlsxwriter's constant_memory mode;
+# colors come from a handful of conditional formats instead of per-cell styles.
+
+def _cell(value):
+    # Series.tolist() already gives Python scalars; NaN/NaT/None become blank cells
+    if value is None or (isinstance(value, float) and value != value) or value is pd.NaT:
+        return None
+    return value
+
+
+def _write_table(workbook, worksheet, df, first_row=0):
+    header_format = workbook.add_format({"bold": True, "bg_color": "#f2f2f2", "border": 1})
+    worksheet.write_row(first_row, 0, [str(col) for col in df.columns], header_format)
+    columns = [df[col].tolist() for col in df.columns]
+    for offset, row in enumerate(zip(*columns), start=first_row + 1):
+        worksheet.write_row(offset, 0, [_cell(value) for value in row])
+
+    for i, col in enumerate(df.columns):
+        longest = df[col].astype(str).str.len().max() if len(df) else 0
+        worksheet.set_column(i, i, min(max(len(str(col)), longest or 0) + 2, MAX_COLUMN_WIDTH))
+    worksheet.freeze_panes(first_row + 1, 0)
+    return first_row + len(df)
+
+
+def _add_status_colors(workbook, worksheet, df, first_row, last_row):
+    if last_row <= first_row:
+        return
+    from xlsxwriter.utility import xl_col_to_name
+
+    status_formats = {status: workbook.add_format({"bg_color": bg}) for status, (bg, _) in STATUS_COLORS.items()}
+    for status_col, columns in STATUS_COLUMN_GROUPS.items():
+        if status_col not in df.columns:
+            continue
+        status_letter = xl_col_to_name(df.columns.get_loc(status_col))
+        for col in columns:
+            if col not in df.columns:
+                continue
+            col_letter = xl_col_to_name(df.columns.get_loc(col))
+            cell_range = f"{col_letter}{first_row + 2}:{col_letter}{last_row + 1}"
+            for status, fmt in status_formats.items():
+                if status == "✅ Match" and col != status_col:
+                    continue  # matching values stay uncolored; only the status cell goes green
+                worksheet.conditional_format(cell_range, {
+                    "type": "formula",
+                    "criteria": f'=${status_letter}{first_row + 2}="{status}"',
+                    "format": fmt,
+                })
+
+
+def write_results_sheet(workbook, results_df, name="Results"):
+    worksheet = workbook.add_worksheet(name)
+    last_row = _write_table(workbook, worksheet, results_df)
+    _add_status_colors(workbook, worksheet, results_df, 0, last_row)
+    return worksheet
+
+
+def action_plan_table(action_plan):
+    frames = [section.assign(**{"Action": title}) for title, section in action_plan.sections()]
+    if action_plan.missing:
+        frames.append(pd.DataFrame({"ECU": list(action_plan.missing), "Action": "Missing from Master SW List"}))
+    if action_plan.other_no_update:
+        frames.append(pd.DataFrame({"ECU": list(action_plan.other_no_update), "Action": "No update required"}))
+    if not frames:
+        return pd.DataFrame(columns=["Action", "ECU"])
+    table = pd.concat(frames, ignore_index=True)
+    return table[["Action"] + [col for col in table.columns if col != "Action"]]
+
+
+def summary_table(results_df):
+    statuses = list(STATUS_COLORS)
+    part_counts = results_df["Part Status"].value_counts() if "Part Status" in results_df else pd.Series(dtype=int)
+    sw_counts = results_df["SW Status"].value_counts() if "SW Status" in results_df else pd.Series(dtype=int)
+    summary = pd.DataFrame({
+        "Status": statuses,
+        "Part Status": [int(part_counts.get(s, 0)) for s in statuses],
+        "SW Status": [int(sw_counts.get(s, 0)) for s in statuses],
+    })
+    total = pd.DataFrame({"Status": ["Total ECUs"], "Part Status": [len(results_df)], "SW Status": [len(results_df)]})
+    return pd.concat([summary, total], ignore_index=True)
+
+
+# === PUBLIC API ===
+
+@timed("excel_export")
+def write_excel_report(target, results_df, action_plan=None, constant_memory=True):
+    # target: file path or binary file object. constant_memory keeps only the current row in memory,
+    # which is what makes large multi-VSR workbooks cheap. xlsxwriter is only loaded by the first export.
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(target, {"constant_memory": constant_memory, "in_memory": not constant_memory})
+    try:
+        write_results_sheet(workbook, results_df)
+        if action_plan is not None:
+            _write_table(workbook, workbook.add_worksheet("Action Plan"), action_plan_table(action_plan))
+        _write_table(workbook, workbook.add_worksheet("Summary"), summary_table(results_df))
+    finally:
+        workbook.close()
+
+
+def excel_report_bytes(results_df, action_plan=None, constant_memory=True):
+    towrite = BytesIO()
+    write_excel_report(towrite, results_df, action_plan, constant_memory)
+    return towrite.getvalue()
@@ -0,0 +1,301 @@
+import argparse
+import glob
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from diagnostics import timed
+
+# === CONFIGURATION ===
+FLEET_STORE_DIR = Path(os.environ.get("VSR_CHECKER_FLEET_DIR", Path.home() / ".vsr_checker" / "fleet"))
+UNKNOWN_PROGRAM = "unknown"
+
+# Every result is stored as text: Priority mixes numbers with "N/A", and one schema for all
+# files keeps the dataset readable without unifying types at query time
+RESULT_COLUMNS = ["ECU", "🚗Reported Part #", "📒Expected Part #", "Part Status", "🚗Reported SW",
+                  "📒Expected SW", "SW Status", "Priority", "FI Owner", "Subsystem Owner"]
+SCAN_COLUMNS = ["VIN", "VSR", "Scan Time", "Checked At"]
+FLEET_SCHEMA = pa.schema([(col, pa.string()) for col in SCAN_COLUMNS + RESULT_COLUMNS])
+PARTITION_SCHEMA = pa.schema([("scan_date", pa.string()), ("program", pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+DATASET_SCHEMA = pa.unify_schemas([FLEET_SCHEMA, PARTITION_SCHEMA])
+
+FLEET_GROUPINGS = ("ECU", "Priority", "FI Owner", "Subsystem Owner")
+MISMATCH_STATUSES = ("⚠️ Older", "💜 Newer")
+
+
+# === WRITING ===
+# One file per VSR, named by its content hash: re-checking a scan replaces its rows instead of
+# adding a second copy. Layout: <root>/scan_date=YYYY-MM-DD/program=<body>/<sha256>.parquet.
+# Each partition's per-scan files are folded into one COMPACTED_FILE, since opening thousands of
+# small files is what makes a large dataset slow to query: automatically once a partition holds
+# AUTO_COMPACT_FILES of them, and by compact() at the end of batch runs.
+
+COMPACTED_FILE = "compacted.parquet"
+AUTO_COMPACT_FILES = 50
+# Hidden names, so dataset discovery skips them
+LOCK_FILE = ".compacting"  # held while a partition's compacted file is rewritten
+LOCK_WAIT_SECONDS = 60
+STALE_LOCK_SECONDS = 600  # a lock this old was left behind by a crashed process
+UNDATED_INDEX = ".undated"  # <root>/.undated/<sha256> holds the day an undated scan was first stored
+
+
+def _scan_day(scan_time):
+    # None when the scan-tool date can't be read
+    parsed = pd.to_datetime(scan_time, errors="coerce") if scan_time else pd.NaT
+    return None if pd.isna(parsed) else parsed.date().isoformat()
+
+
+def _partition_value(value):
+    value = str(value or "").strip()
+    # Keep partition directory names filesystem-safe
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in value) or UNKNOWN_PROGRAM
+
+
+def _read_file(path, columns=None):
+    # partitioning=None: the hive directory names are not columns of the file itself
+    return pq.read_table(path, columns=columns, partitioning=None, schema=FLEET_SCHEMA)
+
+
+def _write_file(table, target):
+    # Written under a hidden name, so dataset discovery never lists a half-written file
+    target = Path(target)
+    tmp = target.with_name(f".{target.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, target)
+
+
+@contextmanager
+def _partition_lock(partition, wait=True):
+    # Serializes rewrites of a partition's compacted file across threads and processes. Yields
+    # False when the lock wasn't free (at once, or within LOCK_WAIT_SECONDS when waiting).
+    lock = Path(partition) / LOCK_FILE
+    deadline = time.monotonic() + (LOCK_WAIT_SECONDS if wait else 0)
+    while True:
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - lock.stat().st_mtime > STALE_LOCK_SECONDS:
+                    os.remove(lock)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() >= deadline:
+                yield False
+                return
+            time.sleep(0.05)
+    try:
+        yield True
+    finally:
+        try:
+            os.remove(lock)
+        except FileNotFoundError:
+            pass
+
+
+def _undated_day(root, digest):
+    # A scan without a readable date is filed under the day it was first checked; remembering that
+    # day by digest sends a re-check to the same partition instead of searching all of them
+    marker = Path(root) / UNDATED_INDEX / digest
+    try:
+        return marker.read_text(encoding="ascii").strip()
+    except FileNotFoundError:
+        day = date.today().isoformat()
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        tmp = marker.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(day, encoding="ascii")
+        os.replace(tmp, marker)
+        return day
+
+
+def _drop_compacted(partition, digests):
+    # Remove these VSRs' rows from a partition's compacted file (only when they are in it)
+    compacted = Path(partition) / COMPACTED_FILE
+    if not compacted.exists():
+        return
+    stored = _read_file(compacted, ["VSR"])["VSR"]
+    value_set = pa.array(list(digests), pa.string())
+    if not pc.any(pc.is_in(stored, value_set=value_set)).as_py():
+        return
+    table = _read_file(compacted)
+    kept = table.filter(pc.invert(pc.is_in(table["VSR"], value_set=value_set)))
+    if kept.num_rows:
+        _write_file(kept, compacted)
+    else:
+        os.remove(compacted)
+
+
+@timed("fleet_record")
+def record_results(results_df, digest, vehicle, root=FLEET_STORE_DIR):
+    # results_df: compare_to_master output; vehicle: vsr_parser.parse_vehicle_info output
+    root = Path(root)
+    day = _scan_day(vehicle.get("Scan Time")) or _undated_day(root, digest)
+    partition = root / f"scan_date={day}" / f"program={_partition_value(vehicle.get('Body'))}"
+    target = partition / f"{digest}.parquet"
+
+    frame = results_df.reindex(columns=RESULT_COLUMNS).astype("string")
+    frame.insert(0, "VIN", vehicle.get("VIN"))
+    frame.insert(1, "VSR", digest)
+    frame.insert(2, "Scan Time", vehicle.get("Scan Time"))
+    frame.insert(3, "Checked At", datetime.now().isoformat(timespec="seconds"))
+    table = pa.Table.from_pandas(frame, schema=FLEET_SCHEMA, preserve_index=False)
+
+    partition.mkdir(parents=True, exist_ok=True)
+    # Under the partition lock, so a compaction never folds in (and then deletes) a file that is
+    # being replaced. Every copy of a VSR lands in this partition, the only one with older rows of it.
+    with _partition_lock(partition) as locked:
+        if not locked:
+            raise TimeoutError(f"{partition} is locked by another writer")
+        _write_file(table, target)
+        _drop_compacted(partition, [digest])
+    if len(_pending_files(partition)) >= AUTO_COMPACT_FILES:
+        compact_partition(partition, wait=False)
+    return target
+
+
+def _pending_files(partition):
+    return sorted(p for p in Path(partition).glob("*.parquet") if p.name != COMPACTED_FILE)
+
+
+def compact_partition(partition, wait=True):
+    # Returns the number of per-scan files folded into the partition's compacted file. Without
+    # wait, a partition another thread or process is already rewriting is left alone.
+    with _partition_lock(partition, wait) as locked:
+        return _compact_partition_locked(Path(partition)) if locked else 0
+
+
+def _compact_partition_locked(partition):
+    files = _pending_files(partition)
+    if not files:
+        return 0
+    tables = [_read_file(path) for path in files]
+    compacted = partition / COMPACTED_FILE
+    if compacted.exists():
+        # Per-scan files are newer than anything already compacted
+        existing = _read_file(compacted)
+        replaced = pc.is_in(existing["VSR"], value_set=pa.array([p.stem for p in files], pa.string()))
+        tables.insert(0, existing.filter(pc.invert(replaced)))
+    _write_file(pa.concat_tables(tables), compacted)
+    for path in files:
+        os.remove(path)
+    return len(files)
+
+
+def compact(root=FLEET_STORE_DIR, min_files=2):
+    # Safe while others write: each partition is locked while its compacted file is rewritten
+    folded = 0
+    for partition in glob.glob(str(Path(root) / "scan_date=*" / "program=*")):
+        if len(_pending_files(partition)) >= min_files:
+            folded += compact_partition(partition)
+    return folded
+
+
+# === QUERIES ===
+# Filters on scan_date / program only open the matching partition directories; everything else is
+# pushed down to the Parquet reader, and only the requested columns are decoded.
+
+def fleet_dataset(root=FLEET_STORE_DIR):
+    # Discovery only lists file names: in-flight and lock files are hidden, so no footer is opened here
+    return ds.dataset(str(root), format="parquet", partitioning=PARTITIONING, schema=DATASET_SCHEMA)
+
+
+def fleet_partitions(root=FLEET_STORE_DIR):
+    # (scan_date, program) pairs from the directory names alone
+    rows = [(Path(d).parent.name.split("=", 1)[1], Path(d).name.split("=", 1)[1])
+            for d in glob.glob(str(Path(root) / "scan_date=*" / "program=*"))]
+    return pd.DataFrame(rows, columns=["scan_date", "program"]).sort_values(["scan_date", "program"], ignore_index=True)
+
+
+def fleet_filter(start=None, end=None, programs=None, ecus=None):
+    conditions = []
+    if start is not None:
+        conditions.append(ds.field("scan_date") >= str(start))
+    if end is not None:
+        conditions.append(ds.field("scan_date") <= str(end))
+    if programs:
+        conditions.append(ds.field("program").isin(list(programs)))
+    if ecus:
+        conditions.append(ds.field("ECU").isin(list(ecus)))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def load_fleet_results(columns=None, start=None, end=None, programs=None, ecus=None, root=FLEET_STORE_DIR):
+    if not Path(root).is_dir():
+        return pd.DataFrame(columns=columns or FLEET_SCHEMA.names)
+    table = fleet_dataset(root).to_table(columns=columns, filter=fleet_filter(start, end, programs, ecus))
+    return table.to_pandas()
+
+
+def mismatch_rates(by="ECU", start=None, end=None, programs=None, ecus=None, root=FLEET_STORE_DIR):
+    # Per group: checked ECU rows, distinct vehicles, Older/Newer counts and mismatch rates.
+    # Rates are over rows that could be compared (Not Found rows are counted separately).
+    if by not in FLEET_GROUPINGS:
+        raise ValueError(f"by must be one of {FLEET_GROUPINGS}")
+    columns = list(dict.fromkeys([by, "VIN", "Part Status", "SW Status"]))
+    df = load_fleet_results(columns, start, end, programs, ecus, root)
+
+    part = df["Part Status"].to_numpy(dtype=object)
+    sw = df["SW Status"].to_numpy(dtype=object)
+    flags = pd.DataFrame({
+        by: df[by].fillna("N/A"),
+        "VIN": df["VIN"],
+        "ECU Rows": 1,
+        "Part Checked": part != "❌ Not Found",
+        "Part Older": part == "⚠️ Older",
+        "Part Mismatch": np.isin(part, MISMATCH_STATUSES),
+        "SW Checked": sw != "❌ Not Found",
+        "SW Older": sw == "⚠️ Older",
+        "SW Mismatch": np.isin(sw, MISMATCH_STATUSES),
+        "Not Found": (part == "❌ Not Found") & (sw == "❌ Not Found"),
+    })
+    grouped = flags.groupby(by, sort=False)
+    summary = grouped.sum(numeric_only=True)
+    summary.insert(0, "Vehicles", grouped["VIN"].nunique())
+    summary["Part Mismatch %"] = (100 * summary["Part Mismatch"] / summary["Part Checked"].where(summary["Part Checked"] > 0)).round(1)
+    summary["SW Mismatch %"] = (100 * summary["SW Mismatch"] / summary["SW Checked"].where(summary["SW Checked"] > 0)).round(1)
+    summary = summary.drop(columns=["Part Checked", "SW Checked"]).astype({"Part Older": int, "Part Mismatch": int,
+                                                                          "SW Older": int, "SW Mismatch": int,
+                                                                          "Not Found": int})
+    return summary.sort_values(["SW Mismatch %", "ECU Rows"], ascending=False).reset_index()
+
+
+# === CLI ===
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or compact the fleet results store")
+    parser.add_argument("--root", default=FLEET_STORE_DIR, help="Fleet store folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("compact", help="Fold per-scan files into one file per partition")
+    summary = commands.add_parser("summary", help="Mismatch rates per group")
+    summary.add_argument("--by", choices=FLEET_GROUPINGS, default="ECU")
+    summary.add_argument("--start", help="First scan date (YYYY-MM-DD)")
+    summary.add_argument("--end", help="Last scan date (YYYY-MM-DD)")
+    summary.add_argument("--program", action="append", help="Program (body code); repeat for several")
+    summary.add_argument("--ecu", action="append", help="ECU name; repeat for several")
+    args = parser.parse_args(argv)
+
+    if args.command == "compact":
+        print(f"Compacted {compact(args.root)} result files in {args.root}")
+    else:
+        rates = mismatch_rates(args.by, args.start, args.end, args.program, args.ecu, args.root)
+        print(rates.to_string(index=False) if not rates.empty else "No stored results match")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
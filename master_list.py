@@ -0,0 +1,241 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import stage
+from master_store import MasterStore
+from vsr_compare import build_master_index
+
+# === CONFIGURATION ===
+MASTER_LIST_PATH = r'z:\dp.staging.ah\tmp\VSR_Checker_Data\Master_SW_List.xlsx'
+MASTER_SHEET_NAME = "Master SW List"
+MASTER_LIST_COLUMNS = ["ECU", "Part #", "SW Version", "Priority", "FI Owner", "Subsystem Owner"]
+# Local (not network share) folder for the columnar copies of the master list
+MASTER_CACHE_DIR = Path(os.environ.get("VSR_CHECKER_CACHE_DIR", Path.home() / ".vsr_checker" / "cache"))
+
+# Change log the app saves to; kept next to the workbook so every editor shares it
+MASTER_STORE_PATH = os.environ.get("VSR_CHECKER_MASTER_STORE")
+
+_SIDECAR_KEY = b"vsr_checker_source"
+
+log = logging.getLogger(__name__)
+
+
+# === LOADING ===
+# Plain (non-Streamlit) loaders so the UI and the headless entry points read the list the same way
+
+def read_master_list(path=MASTER_LIST_PATH):
+    return pd.read_excel(path, sheet_name=MASTER_SHEET_NAME, engine="openpyxl")
+
+
+def empty_master_list():
+    return pd.DataFrame(columns=MASTER_LIST_COLUMNS)
+
+
+def _workbook_version(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def master_list_version(path=MASTER_LIST_PATH):
+    # Identifies one revision of the list; changes whenever anyone saves it. Once the list has a
+    # change log store that is its revision, otherwise the workbook's mtime and size.
+    store = open_master_store(path)
+    if store is None:
+        return _workbook_version(path)
+    _sync_workbook(store, path)
+    return ("store", str(store.db_path), store.revision())
+
+
+# === CHANGE LOG STORE ===
+# The app saves edits to a master_store.MasterStore instead of rewriting the workbook; the
+# workbook becomes an export written on demand. Edits made to the workbook directly in Excel are
+# still picked up: when its mtime/size no longer match the last export, its differences from
+# that export are applied to the store as a new revision.
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def master_store_path(path=MASTER_LIST_PATH):
+    if MASTER_STORE_PATH:
+        return Path(MASTER_STORE_PATH)
+    return Path(path).with_name(f"{Path(path).stem}.history.sqlite")
+
+
+def open_master_store(path=MASTER_LIST_PATH, create=False):
+    # The store for this workbook, or None if it has none yet. create=True starts one from the
+    # workbook (when there is a workbook to start from).
+    db_path = master_store_path(path)
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            if not db_path.exists() and not (create and os.path.exists(path)):
+                return None
+            store = _stores[db_path] = MasterStore(db_path)
+    if create and not store.revision():
+        _sync_workbook(store, path, note="Imported from workbook")
+    return store
+
+
+def _sync_workbook(store, path, note="Edited in Excel"):
+    try:
+        version = list(_workbook_version(path)[1:])
+    except OSError:
+        return  # no workbook (yet): the store is the only copy
+    recorded = store.get_meta("workbook")
+    if recorded and recorded["version"] == version:
+        return
+    try:
+        revision = store.import_frame(read_master_list(path), version, author="workbook", note=note)
+        log.info("Master list workbook %s synced at revision %s", path, revision)
+    except Exception as e:
+        # e.g. read-only access to the share: keep using the store as it is
+        log.warning("Could not import master list workbook %s: %s", path, e)
+
+
+def save_master_edits(base_version, updated=None, inserted=None, deleted=None, path=MASTER_LIST_PATH, author=None):
+    # Commit the sidebar editor's delta (see MasterStore.save) against the revision it was loaded
+    # from. Raises master_store.MasterListConflict if someone else changed the same rows first.
+    # The in-memory copy is brought up to date right away, so the next comparison uses the edits.
+    store = open_master_store(path, create=True)
+    if store is None or not base_version or base_version[0] != "store":
+        raise FileNotFoundError(f"No master list store for {path}")
+    revision = store.save(base_version[2], updated, inserted, deleted, author)
+    new_version = ("store", str(store.db_path), revision)
+    with _cache_lock:
+        entry = _cache.get(os.path.abspath(path))
+        if entry and entry["version"] == base_version and revision == base_version[2] + 1:
+            df = store.apply_revision(entry["df"], revision)
+        elif entry and entry["version"] == new_version:
+            df = entry["df"]
+        else:
+            df = store.load()
+        _cache[os.path.abspath(path)] = {"version": new_version, "df": df, "index": None}
+    return new_version
+
+
+def export_master_workbook(path=MASTER_LIST_PATH, output=None):
+    # Write the store's current list to the workbook (or `output`). The file is replaced in one
+    # step, so readers never see half a workbook. Returns the exported revision.
+    store = open_master_store(path, create=True)
+    if store is None:
+        raise FileNotFoundError(f"No master list store for {path}")
+    _sync_workbook(store, path)
+    revision = store.revision()
+    target = Path(output or path)
+    tmp = target.with_name(f"~{target.stem}.{os.getpid()}.tmp.xlsx")
+    store.load(revision).to_excel(tmp, index=False, sheet_name=MASTER_SHEET_NAME, engine="openpyxl")
+    try:
+        os.replace(tmp, target)
+    finally:
+        if tmp.exists():
+            os.remove(tmp)
+    if output is None:
+        store.mark_exported(list(_workbook_version(path)[1:]), revision)
+    return revision
+
+
+# === PARQUET SIDECAR ===
+
+def _sidecar_path(path):
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+    return MASTER_CACHE_DIR / f"{Path(path).stem}-{digest}.parquet"
+
+
+def _read_sidecar(path, master_version):
+    import pyarrow.parquet as pq
+
+    sidecar = _sidecar_path(path)
+    if not sidecar.exists():
+        return None
+    try:
+        metadata = pq.read_schema(sidecar).metadata or {}
+        if json.loads(metadata.get(_SIDECAR_KEY, b"null")) != list(master_version):
+            return None
+        df = pq.read_table(sidecar).to_pandas()
+    except Exception as e:
+        log.warning("Ignoring unreadable master list cache %s: %s", sidecar, e)
+        return None
+    # Arrow hands back missing text cells as None; read_excel gives NaN
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def _write_sidecar(path, master_version, df):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sidecar = _sidecar_path(path)
+    try:
+        sidecar.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(df)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_SIDECAR_KEY] = json.dumps(list(master_version)).encode("utf-8")
+        tmp = sidecar.with_suffix(f".{os.getpid()}.tmp")
+        pq.write_table(table.replace_schema_metadata(metadata), tmp)
+        os.replace(tmp, sidecar)
+    except Exception as e:
+        # Columns Arrow can't type (mixed numbers and text) just mean no sidecar this time
+        log.warning("Could not write master list cache %s: %s", sidecar, e)
+
+
+# === IN-MEMORY CACHE ===
+# One entry per workbook path, valid for a single (path, mtime, size) version. Shared by every
+# Streamlit session in the process, so callers must treat the returned objects as read-only.
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _cached_entry(path):
+    # Timed as a whole: the version check alone is a round trip to the network drive
+    with stage("master_load") as info:
+        master_version = master_list_version(path)
+        key = os.path.abspath(path)
+        with _cache_lock:
+            entry = _cache.get(key)
+            if entry and entry["version"] == master_version:
+                info["cache"] = "hit"
+                return entry
+            info["cache"] = "miss"
+            df = _read_sidecar(path, master_version)
+            info["source"] = "sidecar"
+            if df is None:
+                if master_version[0] == "store":
+                    df, info["source"] = open_master_store(path).load(), "store"
+                else:
+                    df, info["source"] = read_master_list(path), "workbook"
+                _write_sidecar(path, master_version, df)
+            entry = {"version": master_version, "df": df, "index": None}
+            _cache[key] = entry
+            return entry
+
+
+def get_master(path=MASTER_LIST_PATH):
+    # (master_df, master_index, version) from a single version check
+    entry = _cached_entry(path)
+    if entry["index"] is None:
+        with stage("master_index", rows=len(entry["df"])):
+            entry["index"] = build_master_index(entry["df"])
+    return entry["df"], entry["index"], entry["version"]
+
+
+def get_master_list(path=MASTER_LIST_PATH):
+    return _cached_entry(path)["df"]
+
+
+def get_master_index(path=MASTER_LIST_PATH):
+    return get_master(path)[1]
+
+
+def clear_master_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,340 @@
+import argparse
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# === CONFIGURATION ===
+HISTORY_LIMIT = 50  # revisions listed by history() unless asked for more
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key         TEXT PRIMARY KEY,
+    value       TEXT
+);
+CREATE TABLE IF NOT EXISTS revisions (
+    revision      INTEGER PRIMARY KEY AUTOINCREMENT,
+    saved_at      TEXT NOT NULL,
+    author        TEXT,
+    base_revision INTEGER,
+    inserted      INTEGER NOT NULL,
+    updated       INTEGER NOT NULL,
+    deleted       INTEGER NOT NULL,
+    note          TEXT
+);
+CREATE TABLE IF NOT EXISTS row_changes (
+    revision    INTEGER NOT NULL REFERENCES revisions (revision),
+    row_id      INTEGER NOT NULL,
+    op          TEXT NOT NULL,
+    data        TEXT,
+    PRIMARY KEY (row_id, revision)
+);
+CREATE INDEX IF NOT EXISTS row_changes_by_revision ON row_changes (revision);
+CREATE TABLE IF NOT EXISTS rows (
+    row_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    data        TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    label       TEXT PRIMARY KEY,
+    revision    INTEGER NOT NULL REFERENCES revisions (revision),
+    created_at  TEXT NOT NULL,
+    author      TEXT
+);
+"""
+
+
+class MasterListConflict(Exception):
+    # Raised by save() when another editor changed or deleted the same rows since base_revision
+
+    def __init__(self, row_ids, ecus):
+        super().__init__(f"Changed by someone else since you started editing: {', '.join(map(str, ecus))}")
+        self.row_ids = row_ids
+        self.ecus = ecus
+
+
+# === ROW ENCODING ===
+# Rows are stored as JSON objects keyed by column name, so adding or dropping a column (e.g.
+# Model Year / Body) never needs a schema change. Blank cells are left out and whole-number floats
+# stored as ints, so a row reads the same whether it came from the editor or back from Excel.
+
+def _plain(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _encode(row):
+    cells = {col: _plain(value) for col, value in row.items()}
+    return json.dumps({col: value for col, value in cells.items() if value is not None}, ensure_ascii=False,
+                      sort_keys=True)
+
+
+def _frame(row_ids, rows, columns):
+    df = pd.DataFrame.from_records(rows, index=pd.Index(row_ids, name="row_id", dtype="int64"), columns=columns)
+    # Blank text cells read back as NaN, the same as read_excel gives
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df.infer_objects()
+
+
+# === STORE ===
+
+class MasterStore:
+    # The master list as a SQLite change log: every save is a revision holding only the rows it
+    # inserted, updated or deleted, and `rows` is the current state those revisions add up to.
+    # A past revision is rebuilt from the log, so a snapshot is just a named revision number.
+    # The database sits next to the shared workbook, so it keeps SQLite's default rollback
+    # journal: WAL needs shared memory, which network drives don't provide.
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self):
+        # One connection per thread; transactions are started explicitly by _transaction()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so the concurrency check and the writes
+        # it guards can't interleave with another editor's save
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # --- reading ---
+
+    def revision(self, conn=None):
+        row = (conn or self._connect()).execute("SELECT MAX(revision) FROM revisions").fetchone()
+        return row[0] or 0
+
+    def get_meta(self, key, default=None):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value, conn=None):
+        (conn or self._connect()).execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+
+    def columns(self):
+        return self.get_meta("columns", [])
+
+    def _state(self, conn, revision):
+        # {row_id: JSON data} as of a revision, from the last change of each row up to it
+        if revision >= self.revision(conn):
+            return dict(conn.execute("SELECT row_id, data FROM rows ORDER BY row_id"))
+        rows = conn.execute(
+            "SELECT c.row_id, c.data FROM row_changes c JOIN "
+            "(SELECT row_id, MAX(revision) AS revision FROM row_changes WHERE revision <= ? GROUP BY row_id) last "
+            "ON c.row_id = last.row_id AND c.revision = last.revision "
+            "WHERE c.op != 'delete' ORDER BY c.row_id", (revision,))
+        return dict(rows)
+
+    def load(self, revision=None):
+        # The master list (current, or as of `revision`), indexed by row_id in saved order
+        conn = self._connect()
+        state = self._state(conn, self.revision(conn) if revision is None else revision)
+        return _frame(list(state), [json.loads(data) for data in state.values()], self.columns())
+
+    def apply_revision(self, df, revision):
+        # Bring a frame loaded at revision - 1 up to `revision` by replaying only that revision's rows
+        changes = self._connect().execute(
+            "SELECT row_id, data FROM row_changes WHERE revision = ?", (revision,)).fetchall()
+        kept = [(row_id, data) for row_id, data in changes if data is not None]
+        changed = _frame([row_id for row_id, _ in kept], [json.loads(data) for _, data in kept], self.columns())
+        return pd.concat([df.drop(index=[row_id for row_id, _ in changes], errors="ignore"), changed]).sort_index()
+
+    def history(self, limit=HISTORY_LIMIT):
+        # Newest first, with the labels of any snapshots taken at each revision
+        return pd.read_sql_query(
+            "SELECT r.revision, r.saved_at, r.author, r.inserted, r.updated, r.deleted, r.note, "
+            "GROUP_CONCAT(s.label, ', ') AS snapshots "
+            "FROM revisions r LEFT JOIN snapshots s ON s.revision = r.revision "
+            "GROUP BY r.revision ORDER BY r.revision DESC LIMIT ?", self._connect(), params=(limit,))
+
+    def snapshots(self):
+        return pd.read_sql_query("SELECT * FROM snapshots ORDER BY revision DESC, created_at DESC", self._connect())
+
+    # --- writing ---
+
+    def _commit(self, conn, base_revision, updates, inserts, deletes, author, note):
+        # updates: {row_id: JSON data}; inserts: [(row_id or None for a new id, JSON data)]; deletes: row ids.
+        # An empty delta records nothing and returns the current revision.
+        if not (updates or inserts or deletes):
+            return self.revision(conn)
+        revision = conn.execute(
+            "INSERT INTO revisions (saved_at, author, base_revision, inserted, updated, deleted, note) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (datetime.now().isoformat(timespec="seconds"), author, base_revision, len(inserts), len(updates),
+             len(deletes), note)).lastrowid
+        changes = []
+        for row_id, data in updates.items():
+            conn.execute("UPDATE rows SET data = ? WHERE row_id = ?", (data, row_id))
+            changes.append((revision, row_id, "update", data))
+        for row_id, data in inserts:
+            row_id = conn.execute("INSERT INTO rows (row_id, data) VALUES (?, ?)", (row_id, data)).lastrowid
+            changes.append((revision, row_id, "insert", data))
+        for row_id in deletes:
+            conn.execute("DELETE FROM rows WHERE row_id = ?", (row_id,))
+            changes.append((revision, row_id, "delete", None))
+        conn.executemany("INSERT INTO row_changes VALUES (?, ?, ?, ?)", changes)
+        return revision
+
+    def save(self, base_revision, updated=None, inserted=None, deleted=None, author=None, note=None):
+        # Commit one editor's delta made against base_revision:
+        #   updated: {row_id: {column: new value}} (only the edited cells), inserted: [row dicts],
+        #   deleted: [row_id]. Returns the new revision.
+        # Optimistic concurrency: the save goes through unless a row it updates or deletes was
+        # changed by another save after base_revision. Rows added by anyone never conflict.
+        updated, inserted, deleted = dict(updated or {}), list(inserted or []), list(deleted or [])
+        touched = sorted(set(updated) | set(deleted))
+        with self._transaction() as conn:
+            if touched and self.revision(conn) != base_revision:
+                marks = ",".join("?" * len(touched))
+                conflicts = [row_id for (row_id,) in conn.execute(
+                    f"SELECT DISTINCT row_id FROM row_changes WHERE revision > ? AND row_id IN ({marks})",
+                    [base_revision] + touched)]
+                if conflicts:
+                    raise MasterListConflict(conflicts, self._ecus(conn, conflicts))
+            current = dict(conn.execute(
+                f"SELECT row_id, data FROM rows WHERE row_id IN ({','.join('?' * len(updated))})",
+                list(updated))) if updated else {}
+            if len(current) != len(updated):
+                raise KeyError(f"Unknown master list rows: {sorted(set(updated) - set(current))}")
+            updates = {}
+            for row_id, cells in updated.items():
+                row = json.loads(current[row_id])
+                row.update(cells)
+                data = _encode(row)
+                if data != current[row_id]:
+                    updates[row_id] = data
+            inserts = [(None, _encode(row)) for row in inserted]
+            # The editor always offers the standard columns; keep any the list didn't have yet
+            columns = self.columns()
+            added = [col for row in list(updated.values()) + inserted for col in row if col not in columns]
+            if added:
+                self.set_meta("columns", columns + list(dict.fromkeys(added)), conn)
+            return self._commit(conn, base_revision, updates, inserts, deleted, author, note)
+
+    def _ecus(self, conn, row_ids):
+        # ECU names for conflict messages, from each row's last recorded state
+        marks = ",".join("?" * len(row_ids))
+        rows = conn.execute(
+            f"SELECT row_id, data FROM row_changes WHERE row_id IN ({marks}) AND data IS NOT NULL "
+            "ORDER BY revision", row_ids)
+        names = {row_id: json.loads(data).get("ECU") for row_id, data in rows}
+        return [names.get(row_id, f"row {row_id}") for row_id in row_ids]
+
+    def import_frame(self, df, version=None, author=None, note=None):
+        # Bring in a whole master list edited outside the store (the workbook opened in Excel).
+        # version identifies that copy (e.g. the workbook's mtime and size); the copy is diffed
+        # against the revision the previous version was exported or imported at, and only that
+        # delta is applied, so saves made since then are kept. Importing the same version twice is
+        # a no-op. Identical rows keep their row ids; other rows become deletes and inserts.
+        # Returns the new revision (the current one when nothing differs).
+        columns = [str(col) for col in df.columns]
+        incoming = [_encode(dict(zip(columns, values))) for values in df.itertuples(index=False, name=None)]
+        with self._transaction() as conn:
+            current = self.revision(conn)
+            recorded = self.get_meta("workbook")
+            if version is not None and recorded and recorded["version"] == version:
+                return current
+            self.set_meta("columns", columns, conn)
+            live = self._state(conn, current)
+            base = self._state(conn, recorded["revision"]) if recorded else live
+            unmatched = {}
+            for row_id, data in base.items():
+                unmatched.setdefault(data, []).append(row_id)
+            inserts = []
+            for data in incoming:
+                same = unmatched.get(data)
+                if same:
+                    same.pop(0)
+                else:
+                    inserts.append((None, data))
+            deletes = [row_id for row_ids in unmatched.values() for row_id in row_ids if row_id in live]
+            revision = self._commit(conn, current, {}, inserts, deletes, author, note)
+            if version is not None:
+                self.set_meta("workbook", {"version": version, "revision": revision}, conn)
+            return revision
+
+    def mark_exported(self, version, revision):
+        # The workbook now holds `revision`; later edits to it are diffed against that
+        self.set_meta("workbook", {"version": version, "revision": revision})
+
+    def restore(self, revision, author=None):
+        # Roll the list back to an earlier revision as a new revision, so the restore can be undone too
+        with self._transaction() as conn:
+            target, current = self._state(conn, revision), self._state(conn, self.revision(conn))
+            updates = {row_id: data for row_id, data in target.items() if row_id in current and current[row_id] != data}
+            inserts = [(row_id, data) for row_id, data in target.items() if row_id not in current]
+            deletes = [row_id for row_id in current if row_id not in target]
+            return self._commit(conn, self.revision(conn), updates, inserts, deletes, author,
+                                f"Restored revision {revision}")
+
+    def snapshot(self, label, revision=None, author=None):
+        # A backup costs one row: the revision can always be rebuilt from the change log
+        with self._transaction() as conn:
+            revision = self.revision(conn) if revision is None else revision
+            conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                         (label, revision, datetime.now().isoformat(timespec="seconds"), author))
+        return revision
+
+
+# === CLI ===
+
+def main(argv=None):
+    from master_list import MASTER_LIST_PATH, export_master_workbook, master_store_path, open_master_store
+
+    parser = argparse.ArgumentParser(description="Master SW List change history, snapshots and workbook export")
+    parser.add_argument("--master", default=MASTER_LIST_PATH, help="Master SW List workbook the store belongs to")
+    commands = parser.add_subparsers(dest="command", required=True)
+    history = commands.add_parser("history", help="List recent revisions")
+    history.add_argument("--limit", type=int, default=HISTORY_LIMIT)
+    snapshot = commands.add_parser("snapshot", help="Name the current revision as a backup")
+    snapshot.add_argument("label")
+    restore = commands.add_parser("restore", help="Roll back to a revision or snapshot label")
+    restore.add_argument("target")
+    export = commands.add_parser("export", help="Write the current list to the workbook")
+    export.add_argument("--output", help="Write to this .xlsx instead of the shared workbook")
+    args = parser.parse_args(argv)
+
+    store = open_master_store(args.master, create=True)
+    if store is None:
+        parser.error(f"No master list store at {master_store_path(args.master)} and no workbook to create it from")
+    if args.command == "history":
+        revisions = store.history(args.limit)
+        print(revisions.to_string(index=False) if not revisions.empty else "No revisions yet")
+    elif args.command == "snapshot":
+        print(f"Snapshot '{args.label}' = revision {store.snapshot(args.label)}")
+    elif args.command == "restore":
+        labels = store.snapshots().set_index("label")["revision"]
+        target = int(labels[args.target]) if args.target in labels else int(args.target)
+        print(f"Restored revision {target} as revision {store.restore(target)}")
+    else:
+        print(f"Wrote revision {export_master_workbook(args.master, args.output)} to {args.output or args.master}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,152 @@
+import hashlib
+import subprocess
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+
+from action_plan import PRIORITY_SECTIONS, generate_action_plan_html
+from diagnostics import timed
+from results_cache import BoundedCache, frame_digest
+
+# === CONFIGURATION ===
+PDF_TIMEOUT = 30  # seconds before wkhtmltopdf is abandoned for the built-in renderer
+PDF_CACHE_SIZE = 16
+PDF_WORKERS = 2
+
+# Rendering happens off the Streamlit script thread; jobs are cached by action plan content
+_executor = ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="pdf")
+_jobs = BoundedCache(PDF_CACHE_SIZE)
+
+
+# === WKHTMLTOPDF ===
+
+def _wkhtmltopdf_binary():
+    import pdfkit
+
+    try:
+        binary = pdfkit.configuration().wkhtmltopdf
+    except OSError:
+        return None
+    return binary.decode() if isinstance(binary, bytes) else binary
+
+
+@timed("pdf_wkhtmltopdf")
+def render_pdf_wkhtmltopdf(html, timeout=PDF_TIMEOUT):
+    binary = _wkhtmltopdf_binary()
+    if not binary:
+        raise OSError("wkhtmltopdf is not installed or not in PATH")
+    # Called directly (not through pdfkit.from_string) so a hung render can be killed
+    completed = subprocess.run([binary, "--quiet", "-", "-"], input=html.encode("utf-8"),
+                               capture_output=True, timeout=timeout, check=False)
+    if completed.returncode != 0 or not completed.stdout.startswith(b"%PDF"):
+        raise OSError(completed.stderr.decode("utf-8", "replace").strip() or "wkhtmltopdf failed")
+    return completed.stdout
+
+
+# === BUILT-IN RENDERER ===
+# Minimal text-only PDF writer so machines without wkhtmltopdf still get a printable plan
+
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595  # A4 landscape, points
+MARGIN = 40
+LINE_HEIGHT = 13
+WRAP_COLUMNS = 150
+
+
+def _pdf_text(text):
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def action_plan_lines(action_plan):
+    # (font, text) lines describing the plan; "F2" is bold
+    lines = [("F2", "Action Plan"), ("F1", "")]
+    for title, section in action_plan.sections():
+        lines.append(("F2", title))
+        for row in section.to_dict("records"):
+            line = (f"{row['ECU']}: part {row['Reported Part #']} -> {row['Expected Part #']}, "
+                    f"SW {row['Reported SW']} -> {row['Expected SW']}  "
+                    f"(FI Owner: {row['FI Owner']}, Subsystem Owner: {row['Subsystem Owner']})")
+            lines.extend(("F1", part) for part in textwrap.wrap(line, WRAP_COLUMNS, subsequent_indent="    "))
+        lines.append(("F1", ""))
+    for key, title, intro in (("missing", "Missing ECUs", "The following ECUs were not found in the Master SW List: "),
+                              ("other_no_update", "Other ECUs", "The following ECUs do not require updates: ")):
+        if getattr(action_plan, key):
+            lines.append(("F2", title))
+            text = intro + ", ".join(map(str, getattr(action_plan, key))) + "."
+            lines.extend(("F1", part) for part in textwrap.wrap(text, WRAP_COLUMNS))
+            lines.append(("F1", ""))
+    return lines
+
+
+@timed("pdf_builtin")
+def render_pdf_builtin(action_plan):
+    per_page = int((PAGE_HEIGHT - 2 * MARGIN) / LINE_HEIGHT)
+    lines = action_plan_lines(action_plan)
+    pages = [lines[i:i + per_page] for i in range(0, len(lines), per_page)] or [[]]
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for page in pages:
+        commands = []
+        y = PAGE_HEIGHT - MARGIN
+        for font, text in page:
+            size = 12 if font == "F2" else 9
+            commands.append(f"BT /{font} {size} Tf {MARGIN} {y} Td ({_pdf_text(text)}) Tj ET")
+            y -= LINE_HEIGHT
+        stream = "\n".join(commands).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                        "/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>"
+                        % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))).encode("latin-1"))
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+# === BACKGROUND JOBS ===
+
+def action_plan_digest(action_plan):
+    parts = [frame_digest(getattr(action_plan, key)) for key, _ in PRIORITY_SECTIONS]
+    parts += ["|".join(map(str, action_plan.missing)), "|".join(map(str, action_plan.other_no_update))]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def render_action_plan_pdf(action_plan, timeout=PDF_TIMEOUT):
+    # Returns {"data": pdf bytes, "renderer": ..., "note": why the fallback was used (if it was)}
+    try:
+        data = render_pdf_wkhtmltopdf(generate_action_plan_html(action_plan), timeout)
+        return {"data": data, "renderer": "wkhtmltopdf", "note": None}
+    except subprocess.TimeoutExpired:
+        note = f"wkhtmltopdf took longer than {timeout} s"
+    except OSError as e:
+        note = str(e)
+    return {"data": render_pdf_builtin(action_plan), "renderer": "built-in", "note": note}
+
+
+def get_pdf_job(action_plan):
+    return _jobs.get(action_plan_digest(action_plan))
+
+
+def submit_pdf_job(action_plan, timeout=PDF_TIMEOUT):
+    # Returns a Future; an identical plan reuses the running or finished job
+    key = action_plan_digest(action_plan)
+    job = _jobs.get(key)
+    if job is None or (job.done() and job.exception() is not None):
+        job = _executor.submit(render_action_plan_pdf, action_plan, timeout)
+        _jobs.put(key, job)
+    return job
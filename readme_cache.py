@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+# The sidebar ReadMe never waits on the network: it shows the newer of the readme shipped with
+# the app and the last copy fetched from GitHub, and a stale copy is refreshed on a background
+# thread with a short timeout. On the offline plant network the refresh just fails quietly.
+
+# === CONFIGURATION ===
+README_URL = "https://raw.githubusercontent.com/gabrielsteinerstellantis/VSR_Checker/main/readme.txt"
+README_TIMEOUT = 3  # seconds for connecting and for each read
+README_MAX_AGE = 24 * 3600  # seconds before the cached copy is refreshed
+README_RETRY_SECONDS = 300  # after a failed refresh, wait this long before trying again
+README_CACHE_PATH = Path(os.environ.get("VSR_CHECKER_CACHE_DIR", Path.home() / ".vsr_checker" / "cache")) / "readme.txt"
+BUNDLED_README = Path(__file__).with_name("readme.txt")
+README_UNAVAILABLE = f"ReadMe not available offline yet. It is published at {README_URL}"
+
+_refresh_lock = threading.Lock()
+_last_attempt = None
+
+
+# === REFRESH ===
+
+def refresh_readme(cache_path=README_CACHE_PATH, url=README_URL, timeout=README_TIMEOUT):
+    # Blocking: downloads the readme into the cache. Returns False when GitHub can't be reached.
+    import requests  # only the refresh needs it, not every script run
+
+    try:
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException:
+        return False
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(response.text, encoding="utf-8")
+    os.replace(tmp, cache_path)
+    return True
+
+
+def _refresh_in_background(cache_path):
+    try:
+        refresh_readme(cache_path)
+    except OSError:
+        pass  # unwritable cache folder: the bundled copy keeps being shown
+    finally:
+        _refresh_lock.release()
+
+
+def start_readme_refresh(cache_path=README_CACHE_PATH):
+    # At most one refresh at a time, and none within README_RETRY_SECONDS of the last one
+    global _last_attempt
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+    if _last_attempt is not None and time.monotonic() - _last_attempt < README_RETRY_SECONDS:
+        _refresh_lock.release()
+        return False
+    _last_attempt = time.monotonic()
+    threading.Thread(target=_refresh_in_background, args=(cache_path,), name="readme-refresh", daemon=True).start()
+    return True
+
+
+# === PUBLIC API ===
+
+def _mtime(path):
+    try:
+        return Path(path).stat().st_mtime
+    except OSError:
+        return None
+
+
+def load_readme(cache_path=README_CACHE_PATH, bundled_path=BUNDLED_README):
+    cached_at = _mtime(cache_path)
+    if cached_at is None or time.time() - cached_at > README_MAX_AGE:
+        start_readme_refresh(cache_path)
+    # A freshly updated install can ship a newer readme than the cached download
+    candidates = [(_mtime(path), path) for path in (cache_path, bundled_path)]
+    for _, path in sorted((c for c in candidates if c[0] is not None), key=lambda c: c[0], reverse=True):
+        try:
+            return Path(path).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+    return README_UNAVAILABLE
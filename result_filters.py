@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from vsr_compare import STATUS_VALUES
+
+# === CONFIGURATION ===
+STATUS_COLUMNS = ["Part Status", "SW Status"]
+FILTER_PRIORITIES = (0, 1, 2, 3)  # priorities offered as filter checkboxes
+SEARCH_CACHE_SIZE = 16
+
+
+# === MASK ENGINE ===
+
+class ResultFilter:
+    # Boolean masks for one results frame, built once per result: one per status value and per
+    # priority. A filter combination is then a few mask ANDs/ORs, never a copy of the frame.
+
+    def __init__(self, results_df):
+        self.size = len(results_df)
+        self.status_masks = {}
+        for col in STATUS_COLUMNS:
+            codes = pd.Categorical(results_df[col], categories=STATUS_VALUES).codes if col in results_df else np.full(self.size, -1)
+            self.status_masks[col] = {status: codes == i for i, status in enumerate(STATUS_VALUES)}
+
+        # Priorities as small integer codes; the masks are keyed by the original values
+        priorities = results_df["Priority"] if "Priority" in results_df else pd.Series(dtype=object)
+        codes, values = pd.factorize(priorities)
+        self.priority_masks = {value: codes == i for i, value in enumerate(values)}
+
+        ecus = results_df["ECU"] if "ECU" in results_df else pd.Series(dtype=object)
+        self._ecus = ecus.to_numpy(dtype=object)
+        self._ecus_lower = ecus.astype(str).str.lower()
+        self._search_masks = {}
+
+    def priorities(self):
+        # Whole-number priorities present in the results, limited to the ones offered as filters
+        found = {int(p) for p in self.priority_masks if str(p).isdigit()}
+        return sorted(found & set(FILTER_PRIORITIES))
+
+    def _status_mask(self, column, statuses):
+        mask = np.zeros(self.size, dtype=bool)
+        for status in statuses:
+            mask |= self.status_masks[column][status]
+        return mask
+
+    def _search_mask(self, search):
+        # Case-insensitive substring match on the ECU name; recent searches are kept
+        key = search.lower()
+        mask = self._search_masks.get(key)
+        if mask is None:
+            mask = self._ecus_lower.str.contains(key, regex=False).to_numpy()
+            if len(self._search_masks) >= SEARCH_CACHE_SIZE:
+                self._search_masks.pop(next(iter(self._search_masks)))
+            self._search_masks[key] = mask
+        return mask
+
+    def mask(self, part_statuses, sw_statuses, priorities=None, hidden_ecus=None, search=""):
+        # No priorities selected means no priority filter, as in the checkbox UI
+        mask = self._status_mask("Part Status", part_statuses) & self._status_mask("SW Status", sw_statuses)
+        if search:
+            mask &= self._search_mask(search)
+        if priorities:
+            selected = np.zeros(self.size, dtype=bool)
+            for value, value_mask in self.priority_masks.items():
+                if value in priorities:
+                    selected |= value_mask
+            mask &= selected
+        if hidden_ecus:
+            mask &= ~np.isin(self._ecus, list(hidden_ecus))
+        return mask
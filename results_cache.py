@@ -0,0 +1,93 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from diagnostics import stage
+from vsr_compare import compare_scan
+from vsr_parser import parse_vsr
+
+# === CONFIGURATION ===
+RESULTS_CACHE_SIZE = 32  # parsed + compared VSRs kept in memory, least recently used dropped first
+
+
+# === BOUNDED LRU CACHE ===
+
+class BoundedCache:
+    # Thread-safe LRU map with hit/miss counters; Streamlit sessions share one instance per process
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+
+_results = BoundedCache(RESULTS_CACHE_SIZE)
+
+
+# === PARSE + COMPARE MEMOIZATION ===
+
+def vsr_digest(html_content):
+    if isinstance(html_content, str):
+        html_content = html_content.encode("utf-8")
+    return hashlib.sha256(html_content).hexdigest()
+
+
+def frame_digest(df):
+    # Content hash of a (filtered) results frame, for caching derived exports
+    row_hashes = pd.util.hash_pandas_object(df.astype(str), index=True)
+    return hashlib.sha256(row_hashes.to_numpy().tobytes() + "|".join(map(str, df.columns)).encode("utf-8")).hexdigest()
+
+
+def check_vsr_cached(html_content, master_index, master_version, backend="auto", digest=None):
+    # Returns (scan, results_df, summary) for this exact file and master list revision: the
+    # ScanRecord, the comparison and its ScanSummary. They are shared with later hits, so
+    # callers must copy the frames before modifying them.
+    key = (digest or vsr_digest(html_content), master_version, backend)
+    with stage("check_vsr") as info:
+        cached = _results.get(key)
+        info["cache"] = "miss" if cached is None else "hit"
+        if cached is not None:
+            return cached
+        scan = parse_vsr(html_content, backend=backend)
+        results_df, summary = compare_scan(scan, master_index)
+        _results.put(key, (scan, results_df, summary))
+        return scan, results_df, summary
+
+
+def results_cache_stats():
+    return _results.stats()
+
+
+def clear_results_cache():
+    _results.clear()
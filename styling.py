@@ -0,0 +1,34 @@
+import pandas as pd
+
+# === STATUS COLORS ===
+# status -> (background, text) and status column -> columns it colors. Shared by the results
+# table and the exports so every view uses the same palette.
+
+STATUS_COLORS = {
+    "✅ Match": ("#d4edda", "#155724"),
+    "⚠️ Older": ("#fff3cd", "#856404"),
+    "💜 Newer": ("#e0b0ff", "#4b0082"),
+    "❌ Not Found": ("#f8d7da", "#721c24"),
+}
+
+STATUS_COLUMN_GROUPS = {
+    "Part Status": ["🚗Reported Part #", "📒Expected Part #", "Part Status"],
+    "SW Status": ["🚗Reported SW", "📒Expected SW", "SW Status"],
+}
+
+STATUS_CSS = {status: f"background-color: {bg}; color: {fg}" for status, (bg, fg) in STATUS_COLORS.items()}
+
+
+def highlight_status(df):
+    # For Styler.apply(..., axis=None): one status -> CSS lookup per status column,
+    # broadcast to the columns that status describes
+    styles = pd.DataFrame("", index=df.index, columns=df.columns)
+    for status_col, columns in STATUS_COLUMN_GROUPS.items():
+        if status_col not in df.columns:
+            continue
+        # Categorical statuses map per category, then become plain strings for the Styler
+        css = df[status_col].map(STATUS_CSS).astype(object).fillna("")
+        for col in columns:
+            if col in styles.columns:
+                styles[col] = css
+    return styles
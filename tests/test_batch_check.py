@@ -0,0 +1,18 @@
+from pathlib import Path
+
+from batch_check import file_labels, output_name
+
+
+def test_same_named_files_get_distinct_labels(tmp_path):
+    files = [str(tmp_path / "line1" / "scan.htm"), str(tmp_path / "line2" / "scan.htm")]
+    labels = file_labels(files)
+    assert labels == {files[0]: str(Path("line1") / "scan.htm"), files[1]: str(Path("line2") / "scan.htm")}
+
+
+def test_files_from_one_folder_keep_their_names(tmp_path):
+    files = [tmp_path / "a.htm", tmp_path / "b.html"]
+    assert file_labels(files) == {files[0]: "a.htm", files[1]: "b.html"}
+
+
+def test_output_name_carries_the_digest():
+    assert output_name("D:/scans/line1/scan.htm", "0123456789abcdef", "_action_plan.html") == "scan_01234567_action_plan.html"
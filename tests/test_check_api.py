@@ -0,0 +1,108 @@
+import asyncio
+import tracemalloc
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import tornado.httpclient
+import tornado.netutil
+from tornado.httpserver import HTTPServer
+
+import check_api
+import diagnostics
+from check_api import CheckService
+
+
+class _Pool:
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.submitted = 0
+
+    def submit(self, fn, html_content, name, digest, include_results):
+        self.submitted += 1
+        future = Future()
+        if self.broken:
+            future.set_exception(BrokenProcessPool("a child process terminated abruptly"))
+        else:
+            future.set_result({"file": name, "sha256": digest, "ecus": 1})
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def test_unreachable_master_keeps_current_pool(monkeypatch):
+    calls = []
+
+    def unreachable(path):
+        calls.append(path)
+        raise OSError("network path not found")
+
+    service = CheckService(master_path=r"\\share\master.xlsx", workers=1)
+    pool = _Pool()
+    service._executor = pool
+    service.master_version = "v1"
+    monkeypatch.setattr(check_api, "master_list_version", unreachable)
+    restarts = []
+    monkeypatch.setattr(service, "_start_pool", lambda: restarts.append(True))
+
+    async def twice():
+        return await service.executor(), await service.executor()
+
+    first, second = asyncio.run(twice())
+    assert first is pool and second is pool
+    assert len(calls) == 1  # not retried within MASTER_CHECK_SECONDS
+    assert not restarts
+
+
+def test_broken_pool_is_restarted_and_request_retried(monkeypatch):
+    service = CheckService(master_path="master.xlsx", workers=1)
+    broken, fresh = _Pool(broken=True), _Pool()
+    service._executor = broken
+    service.master_version = "v1"
+    monkeypatch.setattr(check_api, "master_list_version", lambda path: "v1")
+
+    restarts = []
+
+    def start_pool():
+        restarts.append(True)
+        service._executor = fresh
+    monkeypatch.setattr(service, "_start_pool", start_pool)
+
+    async def two_requests():
+        return await asyncio.gather(service.check(b"<html/>", "a.htm"), service.check(b"<html/>", "b.htm"))
+
+    responses = asyncio.run(two_requests())
+    assert [r.get("error") for r in responses] == [None, None]
+    assert broken.submitted == 2 and fresh.submitted == 2
+    assert len(restarts) == 1  # the second request found the pool already replaced
+    assert service.failed == 0
+
+
+def test_concurrent_requests_are_timed_without_nesting(monkeypatch):
+    service = CheckService(master_path="master.xlsx", workers=1)
+    service._executor = _Pool()
+    service.master_version = "v1"
+    monkeypatch.setattr(check_api, "master_list_version", lambda path: "v1")
+    diagnostics.reset_stage_stats()
+
+    async def two_requests():
+        sockets = tornado.netutil.bind_sockets(0, "127.0.0.1")
+        server = HTTPServer(check_api.make_app(service))
+        server.add_sockets(sockets)
+        url = f"http://127.0.0.1:{sockets[0].getsockname()[1]}/check"
+        client = tornado.httpclient.AsyncHTTPClient()
+        try:
+            return await asyncio.gather(*(client.fetch(url, method="POST", body=b"<html/>") for _ in range(2)))
+        finally:
+            server.stop()
+
+    tracemalloc.start()
+    try:
+        responses = asyncio.run(two_requests())
+    finally:
+        tracemalloc.stop()
+    assert [r.code for r in responses] == [200, 200]
+    assert diagnostics._stats["api_check"]["calls"] == 2
+    assert diagnostics._stats["api_check"]["peak_mb"] is None
+    assert not getattr(diagnostics._open, "stack", [])  # nothing left open on the event-loop thread
+    diagnostics.reset_stage_stats()
@@ -0,0 +1,50 @@
+import tracemalloc
+
+import pytest
+
+import diagnostics
+from diagnostics import stage
+
+
+@pytest.fixture
+def tracing():
+    diagnostics.reset_stage_stats()
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+    diagnostics.reset_stage_stats()
+
+
+def _peak(name):
+    return diagnostics._stats[name]["peak_mb"]
+
+
+def test_nested_stage_keeps_outer_peak(tracing):
+    with stage("outer"):
+        big = bytearray(8 * 2**20)
+        del big
+        with stage("inner"):
+            pass
+    # The inner stage must not have reset the peak the outer stage reached before it, nor be
+    # charged with it
+    assert _peak("outer") >= 7.5
+    assert _peak("inner") < 0.5
+
+
+def test_outer_stage_keeps_nested_peak(tracing):
+    with stage("outer"):
+        with stage("inner"):
+            big = bytearray(8 * 2**20)
+            del big
+        with stage("sibling"):
+            pass
+    assert _peak("inner") >= 7.5
+    assert _peak("sibling") < 0.5
+    assert _peak("outer") >= 7.5
+
+
+def test_tracing_stopped_mid_stage_records_none(tracing):
+    with stage("stopped"):
+        tracemalloc.stop()
+    assert _peak("stopped") is None
+    assert diagnostics._stats["stopped"]["calls"] == 1
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pandas as pd
+
+import fleet_store
+from fleet_store import COMPACTED_FILE, load_fleet_results, record_results
+
+
+def _results(ecus=3):
+    return pd.DataFrame({"ECU": [f"ECU_{i}" for i in range(ecus)], "Part Status": "✅ Match", "SW Status": "⚠️ Older"})
+
+
+def _vehicle(scan_time="04/14/2025"):
+    return {"VIN": "1C4RJFBG0MC000001", "Body": "WL", "Scan Time": scan_time}
+
+
+def test_partition_compacts_itself_at_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(fleet_store, "AUTO_COMPACT_FILES", 4)
+    for i in range(4):
+        target = record_results(_results(), f"{i:064x}", _vehicle(), tmp_path)
+    partition = target.parent
+    assert [p.name for p in partition.glob("*.parquet")] == [COMPACTED_FILE]
+    assert len(load_fleet_results(root=tmp_path)) == 12
+
+    # A re-check replaces the compacted rows of that VSR instead of adding to them
+    record_results(_results(2), f"{0:064x}", _vehicle(), tmp_path)
+    assert len(load_fleet_results(root=tmp_path)) == 11
+    assert not (partition / fleet_store.LOCK_FILE).exists()
+
+
+def test_undated_recheck_replaces_its_rows(tmp_path, monkeypatch):
+    digest = "f" * 64
+    first = record_results(_results(), digest, _vehicle(None), tmp_path)
+    fleet_store.compact_partition(first.parent)
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("record_results searched the other partitions")
+
+    # The undated scan's day is looked up by digest, not by opening every partition
+    monkeypatch.setattr(fleet_store.glob, "glob", no_search)
+    second = record_results(_results(), digest, _vehicle(None), tmp_path)
+    assert second == first
+    assert len(load_fleet_results(root=tmp_path)) == 3
+
+
+def test_in_flight_files_are_not_discovered(tmp_path, monkeypatch):
+    target = record_results(_results(), "e" * 64, _vehicle(), tmp_path)
+    # What a writer that crashed mid-write leaves behind: not Parquet, and not listed either
+    (target.parent / f".{'d' * 64}.123.456.tmp").write_bytes(b"half a footer")
+    written = []
+    real_write = fleet_store.pq.write_table
+    monkeypatch.setattr(fleet_store.pq, "write_table", lambda table, path: (written.append(Path(path).name),
+                                                                            real_write(table, path)))
+    record_results(_results(), "c" * 64, _vehicle(), tmp_path)
+    assert written and all(name.startswith(".") for name in written)
+    assert len(load_fleet_results(root=tmp_path)) == 6
@@ -0,0 +1,53 @@
+import sqlite3
+
+from benchmarks.synthetic import make_vsr_html
+from vsr_archive import VsrArchive
+from vsr_diff import previous_scan
+
+VIN = "1C4RJFBG0MC000001"
+
+
+def _scan(scan_date, seed):
+    html = make_vsr_html(ecu_count=10, vin=VIN, seed=seed)
+    if scan_date is not None:
+        html = html.replace("<tr><td>Body</td>", f"<tr><td>Scan Date</td><td>{scan_date}</td></tr>\n<tr><td>Body</td>")
+    return html.encode("utf-8")
+
+
+def _ingest_all(archive, dates):
+    return {date: archive.ingest(_scan(date, seed), file_name=f"{seed}.htm")[0] for seed, date in enumerate(dates)}
+
+
+def test_scans_sort_by_date_across_years(tmp_path):
+    archive = VsrArchive(tmp_path)
+    digests = _ingest_all(archive, ["01/15/2027", "12/15/2024", "03/02/2025"])
+
+    scans = archive.scans_for_vin(VIN)
+    assert scans["scan_time"].tolist() == ["12/15/2024", "03/02/2025", "01/15/2027"]
+    history = archive.history_ecus(VIN)
+    assert list(dict.fromkeys(history["sha256"])) == scans["sha256"].tolist()
+    assert previous_scan(archive, VIN, digests["01/15/2027"])["sha256"] == digests["03/02/2025"]
+    assert previous_scan(archive, VIN, digests["12/15/2024"]) is None
+
+
+def test_undated_scan_sorts_by_ingest_time(tmp_path):
+    archive = VsrArchive(tmp_path)
+    _ingest_all(archive, ["12/15/2024", None])
+
+    scans = archive.scans_for_vin(VIN)
+    # Ingested today, so after a 2024 scan rather than first
+    assert scans["scan_time"].tolist() == ["12/15/2024", None]
+    assert scans["scanned_at"].iloc[1] == scans["ingested_at"].iloc[1]
+
+
+def test_old_catalog_gets_scanned_at(tmp_path):
+    archive = VsrArchive(tmp_path)
+    _ingest_all(archive, ["01/15/2027", "12/15/2024"])
+    with sqlite3.connect(archive.db_path) as conn:
+        # Back to the layout of catalogs written before scanned_at existed
+        conn.execute("DROP INDEX scans_by_vin_scanned")
+        conn.execute("ALTER TABLE scans DROP COLUMN scanned_at")
+        conn.execute("CREATE INDEX scans_by_vin ON scans (vin, scan_time, ingested_at)")
+
+    reopened = VsrArchive(tmp_path)
+    assert reopened.scans_for_vin(VIN)["scanned_at"].tolist() == ["2024-12-15T00:00:00", "2027-01-15T00:00:00"]
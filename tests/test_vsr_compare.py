@@ -0,0 +1,13 @@
+from vsr_compare import NOT_FOUND, STATUS_VALUES, ScanSummary
+
+
+def test_summary_row_has_every_status_for_part_and_sw():
+    part = dict(zip(STATUS_VALUES, (3, 2, 1, 4)))
+    sw = dict(zip(STATUS_VALUES, (5, 1, 2, 2)))
+    row = ScanSummary(vehicle={"VIN": "1C4RJFAG0FC000001"}, ecus=12, responding=11, in_master=10,
+                      part_status=part, sw_status=sw).as_row()
+    for status in STATUS_VALUES:
+        assert row[f"Part {status}"] == part[status]
+        assert row[f"SW {status}"] == sw[status]
+    assert row[f"Part {NOT_FOUND}"] == 4
+    assert row["Part Match %"] == 30.0 and row["SW Match %"] == 50.0
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from vsr_compare import compare_to_master
+from vsr_parser import parse_vehicle_info
+
+VIN = "1C4RJFAG0FC000001"
+
+
+def _page(*cells):
+    rows = "".join(f"<tr><td>{label}</td><td>{value}</td></tr>" for label, value in cells)
+    return f"<html><body><table>{rows}</table></body></html>"
+
+
+def test_labels_must_end_at_a_word_boundary():
+    info = parse_vehicle_info(_page(("VIN", VIN), ("My Garage Report", "North"), ("Bodyshop", "North"),
+                                    ("Dated by", "workshop")))
+    assert info == {"VIN": VIN, "Model Year": None, "Body": None, "Scan Time": None}
+
+
+def test_real_labels_are_still_read():
+    info = parse_vehicle_info(_page(("VIN:", VIN), ("MY", "2025"), ("Body", "LB"), ("Date", "2025-04-14 08:30")))
+    assert info == {"VIN": VIN, "Model Year": "2025", "Body": "LB", "Scan Time": "2025-04-14 08:30"}
+
+
+def test_model_year_must_look_like_a_year():
+    info = parse_vehicle_info(_page(("Year of build", "unknown"), ("Model Year", "2024")))
+    assert info["Model Year"] == "2024"
+    assert parse_vehicle_info(_page(("MY", "Garage")))["Model Year"] is None
+
+
+def test_garage_header_keeps_master_variant_lookup():
+    # A bogus Model Year / Body used to turn every ECU into "Not Found" on a variant master list
+    master = pd.DataFrame({"ECU": ["BCM"], "Part #": ["68400001AA"], "SW Version": ["24.10.01"],
+                           "Model Year": [2025], "Body": ["LB"]})
+    vsr = pd.DataFrame({"ECU": ["BCM"], "Part #": ["68400001AA"], "SW Version": ["24.10.01"]})
+    vehicle = parse_vehicle_info(_page(("VIN", VIN), ("My Garage Report", "North"), ("Bodyshop", "North")))
+    results = compare_to_master(vsr, master, vehicle)
+    assert results["Part Status"].tolist() == ["✅ Match"]
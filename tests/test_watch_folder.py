@@ -0,0 +1,55 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import watch_folder
+from watch_folder import WatchService
+
+
+class _BrokenPool:
+    def submit(self, *args):
+        raise BrokenProcessPool("a worker died")
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class _Pool:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, path):
+        self.submitted.append(path)
+        return Future()
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def test_broken_pool_is_restarted_and_file_requeued(tmp_path, monkeypatch):
+    service = WatchService(tmp_path / "drop", tmp_path / "out", workers=1, max_in_flight=1)
+    new_pool = _Pool()
+    service._executor = _BrokenPool()
+    monkeypatch.setattr(service, "_start_pool", lambda: setattr(service, "_executor", new_pool))
+    service._ready.append(("scan.htm", 0.0))
+
+    service._submit_ready()  # must not raise out of the dispatcher loop
+
+    assert new_pool.submitted == ["scan.htm"]
+    assert service.in_flight == 1
+    assert not service._slots.acquire(blocking=False)  # the one slot is held by the resubmitted file
+
+
+def test_reports_are_named_after_the_checked_content(tmp_path, monkeypatch):
+    # The digest comes from check_vsr_file; the file is not read again (it may have been
+    # rewritten since), so these paths don't even exist
+    digests = {str(tmp_path / "a" / "scan.htm"): "1a" * 32, str(tmp_path / "b" / "scan.htm"): "2b" * 32}
+    monkeypatch.setattr(watch_folder, "_output_dir", str(tmp_path))
+    monkeypatch.setattr(watch_folder, "check_vsr_file", lambda path: (path, [], None, digests[path], None, 0.0))
+    monkeypatch.setattr(watch_folder, "generate_action_plan", lambda results_df: None)
+    written = []
+    monkeypatch.setattr(watch_folder, "write_excel_report", lambda target, *args: written.append(Path(target).name))
+
+    results = [watch_folder.process_vsr_file(path) for path in digests]
+    assert [error for _, error, _, _ in results] == [None, None]
+    assert written == ["scan_1a1a1a1a_results.xlsx", "scan_2b2b2b2b_results.xlsx"]
@@ -0,0 +1,198 @@
+import argparse
+import gzip
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from diagnostics import timed
+from results_cache import vsr_digest
+from vsr_parser import parse_vehicle_info, parse_vsr
+
+# === CONFIGURATION ===
+VSR_ARCHIVE_DIR = Path(os.environ.get("VSR_CHECKER_ARCHIVE_DIR", Path.home() / ".vsr_checker" / "archive"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    sha256      TEXT PRIMARY KEY,
+    vin         TEXT,
+    model_year  TEXT,
+    body        TEXT,
+    scan_time   TEXT,
+    ingested_at TEXT NOT NULL,
+    file_name   TEXT,
+    size        INTEGER NOT NULL,
+    ecu_count   INTEGER NOT NULL,
+    scanned_at  TEXT
+);
+CREATE TABLE IF NOT EXISTS scan_ecus (
+    sha256      TEXT NOT NULL REFERENCES scans (sha256),
+    position    INTEGER NOT NULL,
+    ecu         TEXT,
+    part_number TEXT,
+    sw_version  TEXT,
+    PRIMARY KEY (sha256, position)
+);
+"""
+# scan_time is the header text as printed (e.g. 12/15/2024), which doesn't sort as text; scans are
+# ordered by scanned_at, the same time as ISO text, or ingested_at when the header has no date
+_INDEX = "CREATE INDEX IF NOT EXISTS scans_by_vin_scanned ON scans (vin, scanned_at, ingested_at)"
+
+
+def _scanned_at(scan_time, ingested_at):
+    parsed = pd.to_datetime(scan_time, errors="coerce") if scan_time else pd.NaT
+    if pd.isna(parsed):
+        return ingested_at
+    if parsed.tzinfo is not None:
+        parsed = parsed.tz_convert(None)
+    return parsed.isoformat(timespec="seconds")
+
+
+# === ARCHIVE ===
+
+class VsrArchive:
+    # Content-addressed store: blobs/<2 hex>/<sha256>.htm.gz plus a SQLite catalog of scans and
+    # their parsed ECU rows, so a VIN's history is an index lookup with no HTML re-parsing
+
+    def __init__(self, root=VSR_ARCHIVE_DIR):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.root / "catalog.sqlite"
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            self._add_scanned_at(conn)
+            conn.execute(_INDEX)
+
+    @staticmethod
+    def _add_scanned_at(conn):
+        # Catalogs created before scanned_at existed get the column, filled in from their rows
+        if "scanned_at" in {row[1] for row in conn.execute("PRAGMA table_info(scans)")}:
+            return
+        conn.execute("ALTER TABLE scans ADD COLUMN scanned_at TEXT")
+        conn.execute("DROP INDEX IF EXISTS scans_by_vin")
+        rows = conn.execute("SELECT sha256, scan_time, ingested_at FROM scans").fetchall()
+        conn.executemany("UPDATE scans SET scanned_at = ? WHERE sha256 = ?",
+                         [(_scanned_at(scan_time, ingested_at), digest) for digest, scan_time, ingested_at in rows])
+
+    def _connect(self):
+        # One connection per thread; Streamlit sessions and the batch paths each get their own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def blob_path(self, digest):
+        return self.blob_dir / digest[:2] / f"{digest}.htm.gz"
+
+    def contains(self, digest):
+        return self._connect().execute("SELECT 1 FROM scans WHERE sha256 = ?", (digest,)).fetchone() is not None
+
+    @timed("archive_ingest")
+    def ingest(self, html_content, file_name=None, vsr_df=None, digest=None, vehicle=None):
+        # Returns (digest, is_new). A duplicate costs one primary-key lookup: nothing is parsed or written.
+        # vsr_df / vehicle: the caller's parse of this file, if it has one
+        if isinstance(html_content, str):
+            html_content = html_content.encode("utf-8")
+        digest = digest or vsr_digest(html_content)
+        if self.contains(digest):
+            return digest, False
+
+        if vsr_df is None:
+            scan = parse_vsr(html_content)
+            vsr_df, vehicle = scan.ecus, scan.vehicle
+        elif vehicle is None:
+            vehicle = parse_vehicle_info(html_content)
+
+        blob = self.blob_path(digest)
+        blob.parent.mkdir(exist_ok=True)
+        tmp = blob.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(html_content)
+        os.replace(tmp, blob)
+
+        ecu_rows = [
+            (digest, position, ecu, part, sw)
+            for position, (ecu, part, sw) in enumerate(zip(
+                vsr_df.get("ECU", pd.Series(dtype=object)),
+                vsr_df.get("Part #", pd.Series(dtype=object)),
+                vsr_df.get("SW Version", pd.Series(dtype=object))))
+        ]
+        ingested_at = datetime.now().isoformat(timespec="seconds")
+        conn = self._connect()
+        with conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO scans (sha256, vin, model_year, body, scan_time, ingested_at, file_name, "
+                "size, ecu_count, scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (digest, vehicle["VIN"], vehicle["Model Year"], vehicle["Body"], vehicle["Scan Time"], ingested_at,
+                 file_name, len(html_content), len(ecu_rows), _scanned_at(vehicle["Scan Time"], ingested_at))
+            ).rowcount
+            if inserted:
+                conn.executemany("INSERT INTO scan_ecus VALUES (?, ?, ?, ?, ?)", ecu_rows)
+        return digest, bool(inserted)
+
+    def scans_for_vin(self, vin):
+        # Oldest first, so the last row is the most recent scan of the vehicle
+        return pd.read_sql_query(
+            "SELECT * FROM scans WHERE vin = ? ORDER BY scanned_at, ingested_at",
+            self._connect(), params=(vin.upper(),))
+
+    def vins(self):
+        return pd.read_sql_query(
+            "SELECT vin, COUNT(*) AS scans, MAX(ingested_at) AS last_ingested FROM scans "
+            "WHERE vin IS NOT NULL GROUP BY vin ORDER BY last_ingested DESC", self._connect())
+
+    def load_ecus(self, digest):
+        # The stored parse_vsr_html output for a scan
+        return pd.read_sql_query(
+            'SELECT ecu AS "ECU", part_number AS "Part #", sw_version AS "SW Version" '
+            "FROM scan_ecus WHERE sha256 = ? ORDER BY position", self._connect(), params=(digest,))
+
+    def history_ecus(self, vin):
+        # Every stored ECU row of a VIN's scans in one query, oldest scan first
+        return pd.read_sql_query(
+            'SELECT e.sha256, e.ecu AS "ECU", e.part_number AS "Part #", e.sw_version AS "SW Version" '
+            "FROM scans s JOIN scan_ecus e ON e.sha256 = s.sha256 WHERE s.vin = ? "
+            "ORDER BY s.scanned_at, s.ingested_at, e.position", self._connect(), params=(vin.upper(),))
+
+    def load_html(self, digest):
+        with gzip.open(self.blob_path(digest), "rb") as f:
+            return f.read()
+
+
+# === CLI ===
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive VSR files and look up a vehicle's scans")
+    parser.add_argument("--archive", default=VSR_ARCHIVE_DIR, help="Archive folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Add VSR files (duplicates are skipped)")
+    ingest.add_argument("inputs", nargs="+", help="Directories and/or glob patterns of .htm/.html VSR files")
+    lookup = commands.add_parser("vin", help="List the archived scans of a VIN")
+    lookup.add_argument("vin")
+    args = parser.parse_args(argv)
+
+    archive = VsrArchive(args.archive)
+    if args.command == "ingest":
+        from batch_check import find_vsr_files
+
+        added = skipped = 0
+        for path in find_vsr_files(args.inputs):
+            _, is_new = archive.ingest(Path(path).read_bytes(), file_name=Path(path).name)
+            added += is_new
+            skipped += not is_new
+        print(f"Archived {added} new VSRs, skipped {skipped} duplicates ({archive.root})")
+    else:
+        scans = archive.scans_for_vin(args.vin)
+        print(scans.to_string(index=False) if not scans.empty else f"No scans archived for {args.vin}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
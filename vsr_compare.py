@@ -0,0 +1,348 @@
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+from diagnostics import timed
+
+# === CONFIGURATION ===
+MASTER_COLUMNS = ["Part #", "SW Version", "Priority", "FI Owner", "Subsystem Owner"]
+# Optional master list columns that narrow a row to some vehicles; a blank cell matches every vehicle
+VARIANT_COLUMNS = ["Model Year", "Body"]
+NOT_FOUND = "❌ Not Found"
+# Part/SW statuses are categoricals with this fixed category order
+STATUS_VALUES = ["✅ Match", "⚠️ Older", "💜 Newer", NOT_FOUND]
+STATUS_DTYPE = pd.CategoricalDtype(STATUS_VALUES)
+
+
+# === NORMALIZATION KERNEL ===
+# Every distinct SW string is parsed once and every master value is normalized once,
+# when the master index is built; whole columns are then classified in one pass.
+
+SW_VERSION_PATTERN = re.compile(r'\d+\.\d+\.\d+')
+VERSION_CACHE_SIZE = 16384
+
+
+@lru_cache(maxsize=VERSION_CACHE_SIZE)
+def parse_sw_version(sw):
+    # None means the string isn't a valid version, which always compares as "Older"
+    from packaging import version
+
+    found = SW_VERSION_PATTERN.search(sw)
+    try:
+        return version.parse(found.group(0) if found else sw)
+    except version.InvalidVersion:
+        return None
+
+
+def _is_not_found(values):
+    return pd.isna(values) | (values == "N/A")
+
+
+def normalize_sw_versions(values):
+    # Parsed Version per value; NaN/"N/A" and unparseable strings both come back as None
+    parsed = np.full(len(values), None, dtype=object)
+    present = ~_is_not_found(values)
+    parsed[present] = [parse_sw_version(str(v)) for v in values[present]]
+    return parsed
+
+
+def get_part_suffix(pn):
+    return pn.strip()[-2:].upper() if isinstance(pn, str) and len(pn.strip()) >= 2 else ""
+
+
+def normalize_part_suffixes(values):
+    # Vectorized get_part_suffix: anything that isn't a string of 2+ characters has no suffix
+    is_str = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+    stripped = pd.Series(np.where(is_str, values, ""), dtype=object).str.strip()
+    suffixes = stripped.str[-2:].str.upper().where(stripped.str.len() >= 2, "")
+    return suffixes.to_numpy(dtype=object)
+
+
+def _status_from_keys(key_r, key_e):
+    return np.where(key_r == key_e, "✅ Match", np.where(key_r > key_e, "💜 Newer", "⚠️ Older")).astype(object)
+
+
+def classify_sw_versions(parsed_r, parsed_e):
+    # Rank the distinct Versions once so the whole column compares as plain integers
+    status = np.full(len(parsed_r), "⚠️ Older", dtype=object)
+    valid = np.array([r is not None and e is not None for r, e in zip(parsed_r, parsed_e)], dtype=bool)
+    if valid.any():
+        rank = {v: i for i, v in enumerate(sorted(set(parsed_r[valid]) | set(parsed_e[valid])))}
+        key_r = np.array([rank[v] for v in parsed_r[valid]])
+        key_e = np.array([rank[v] for v in parsed_e[valid]])
+        status[valid] = _status_from_keys(key_r, key_e)
+    return status
+
+
+def classify_part_suffixes(suffix_r, suffix_e):
+    if not len(suffix_r):
+        return np.empty(0, dtype=object)
+    return _status_from_keys(suffix_r, suffix_e)
+
+
+# === SCALAR COMPARISONS ===
+
+def compare_sw_versions_advanced(reported_sw, expected_sw):
+    if pd.isna(expected_sw) or pd.isna(reported_sw) or expected_sw == "N/A" or reported_sw == "N/A":
+        return "❌ Not Found"
+    reported = parse_sw_version(str(reported_sw))
+    expected = parse_sw_version(str(expected_sw))
+    if reported is None or expected is None:
+        # Assuming invalid version format might imply older or non-standard
+        return "⚠️ Older"
+    if reported == expected:
+        return "✅ Match"
+    elif reported > expected:
+        return "💜 Newer"
+    else:
+        return "⚠️ Older"
+
+
+def compare_part_numbers(reported, expected):
+    if expected == "N/A" or reported == "N/A":
+        return "❌ Not Found"
+    suffix_r = get_part_suffix(reported)
+    suffix_e = get_part_suffix(expected)
+    if suffix_r == suffix_e:
+        return "✅ Match"
+    elif suffix_r > suffix_e:
+        return "💜 Newer"
+    else:
+        return "⚠️ Older"
+
+
+# === COLUMN-WISE COMPARISONS ===
+
+def _object_values(series):
+    return series.to_numpy(dtype=object)
+
+
+def _is_blank(values):
+    # Same test compare_to_master always applied to reported values: None, NaN or whitespace only
+    missing = pd.isna(values)
+    blank = pd.Series(values, dtype=object).astype(str).str.strip().eq("").to_numpy()
+    return missing | blank
+
+
+def part_status_column(reported, expected, expected_suffix=None):
+    status = np.full(len(reported), NOT_FOUND, dtype=object)
+    comparable = (reported != "N/A") & (expected != "N/A")
+    if expected_suffix is None:
+        expected_suffix = normalize_part_suffixes(expected)
+    status[comparable] = classify_part_suffixes(normalize_part_suffixes(reported[comparable]),
+                                                expected_suffix[comparable])
+    return status
+
+
+def sw_status_column(reported, expected, expected_version=None):
+    status = np.full(len(reported), NOT_FOUND, dtype=object)
+    comparable = ~_is_not_found(reported) & ~_is_not_found(expected)
+    if expected_version is None:
+        expected_version = normalize_sw_versions(expected)
+    status[comparable] = classify_sw_versions(normalize_sw_versions(reported[comparable]),
+                                              expected_version[comparable])
+    return status
+
+
+# === COMPILED MASTER INDEX ===
+
+def normalize_variant(value):
+    # 2025, "2025" and 2025.0 are the same model year; blank, NaN and "N/A" mean "any vehicle"
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    text = str(value).strip().upper()
+    if text.endswith(".0") and text[:-2].isdigit():
+        text = text[:-2]
+    return None if text in ("", "N/A", "NAN") else text
+
+
+class MasterIndex:
+    # The master list compiled once per revision: one row per (ECU, Model Year, Body) key, first row
+    # wins, stored as plain arrays with part suffixes and SW versions already normalized.
+    # Lookups go most specific first: (year, body), (any, body), (year, any), then the ECU-only row.
+    # Treat instances as read-only; they are shared by every comparison against that revision.
+
+    def __init__(self, master_df):
+        master = master_df.reindex(columns=["ECU"] + MASTER_COLUMNS, fill_value="N/A")
+        ecus = _object_values(master["ECU"])
+        variants = [master_df[col].map(normalize_variant).to_numpy(dtype=object) if col in master_df
+                    else np.full(len(master_df), None, dtype=object) for col in VARIANT_COLUMNS]
+
+        self._rows = {}  # (ECU, year, body) -> row
+        self._first = {}  # ECU -> its first row, for vehicles with no variant information
+        keep = []
+        for i, key in enumerate(zip(ecus, *variants)):
+            if pd.isna(key[0]) or key in self._rows:
+                continue
+            self._rows[key] = len(keep)
+            self._first.setdefault(key[0], len(keep))
+            keep.append(i)
+
+        keep = np.array(keep, dtype=int)
+        self.columns = {col: _object_values(master[col])[keep] for col in ["ECU"] + MASTER_COLUMNS}
+        self.columns["_part_suffix"] = normalize_part_suffixes(self.columns["Part #"])
+        self.columns["_sw_version"] = normalize_sw_versions(self.columns["SW Version"])
+        for values in self.columns.values():
+            values.flags.writeable = False
+        self.has_variants = any(any(v is not None for v in values) for values in variants)
+
+    def __len__(self):
+        return len(self.columns["ECU"])
+
+    def contains(self, ecus):
+        # Whether each ECU has any row in the master list
+        return np.fromiter((ecu in self._first for ecu in ecus), dtype=bool, count=len(ecus))
+
+    def positions(self, ecus, vehicle=None):
+        # Row of each ECU for this vehicle (a parse_vehicle_info dict), -1 where there is none
+        if self.has_variants:
+            year = normalize_variant((vehicle or {}).get("Model Year"))
+            body = normalize_variant((vehicle or {}).get("Body"))
+            variants = list(dict.fromkeys([(year, body), (None, body), (year, None), (None, None)]))
+            fallback = self._first if year is None and body is None else {}
+        else:
+            variants, fallback = [(None, None)], {}
+        rows = self._rows
+
+        def find(ecu):
+            for variant in variants:
+                row = rows.get((ecu, *variant))
+                if row is not None:
+                    return row
+            return fallback.get(ecu, -1)
+
+        return np.fromiter((find(ecu) for ecu in ecus), dtype=int, count=len(ecus))
+
+
+def build_master_index(master_df):
+    # Accepts the raw master list or an already compiled index
+    if isinstance(master_df, MasterIndex):
+        return master_df
+    return MasterIndex(master_df)
+
+
+# === SCAN SUMMARY ===
+
+@dataclass(frozen=True)
+class ScanSummary:
+    # Per-scan counters taken from the arrays compare_scan classifies anyway, so summarizing a
+    # scan never needs another pass (value_counts) over its results frame
+    vehicle: dict = field(default_factory=dict)
+    ecus: int = 0  # ECU rows in the VSR
+    responding: int = 0  # ECUs that reported a part number or SW version
+    in_master: int = 0  # ECUs with a master list row for this vehicle
+    part_status: dict = field(default_factory=lambda: dict.fromkeys(STATUS_VALUES, 0))
+    sw_status: dict = field(default_factory=lambda: dict.fromkeys(STATUS_VALUES, 0))
+
+    @staticmethod
+    def _percent(count, total):
+        return round(100 * count / total, 1) if total else None
+
+    @property
+    def coverage(self):
+        # Share of the scanned ECUs the master list knows, in %
+        return self._percent(self.in_master, self.ecus)
+
+    @property
+    def part_match_rate(self):
+        return self._percent(self.part_status["✅ Match"], self.in_master)
+
+    @property
+    def sw_match_rate(self):
+        return self._percent(self.sw_status["✅ Match"], self.in_master)
+
+    def as_row(self):
+        # One line of the vehicle summary tables (app, batch report, HTTP API): every status for
+        # both Part and SW, so the columns follow STATUS_VALUES
+        row = {
+            "VIN": self.vehicle.get("VIN"),
+            "Model Year": self.vehicle.get("Model Year"),
+            "Body": self.vehicle.get("Body"),
+            "ECUs": self.ecus,
+            "Responding": self.responding,
+            "In Master": self.in_master,
+            "Coverage %": self.coverage,
+        }
+        for prefix, counts, rate in (("Part", self.part_status, self.part_match_rate),
+                                     ("SW", self.sw_status, self.sw_match_rate)):
+            for status in STATUS_VALUES:
+                row[f"{prefix} {status}"] = counts[status]
+            row[f"{prefix} Match %"] = rate
+        return row
+
+
+def _status_counts(statuses):
+    # statuses: a STATUS_DTYPE Categorical; counting its codes is one bincount
+    counts = np.bincount(statuses.codes[statuses.codes >= 0], minlength=len(STATUS_VALUES))
+    return dict(zip(STATUS_VALUES, counts.tolist()))
+
+
+# === PUBLIC API ===
+
+def _compare(vsr_df, master_df, vehicle):
+    if vsr_df.empty:
+        return pd.DataFrame(), ScanSummary(vehicle=dict(vehicle or {}))
+
+    n = len(vsr_df)
+    master_index = build_master_index(master_df)
+    ecus = vsr_df["ECU"]
+    positions = master_index.positions(_object_values(ecus), vehicle)
+    matched = positions >= 0
+    expected = {col: values[positions[matched]] for col, values in master_index.columns.items()}
+
+    reported_part = _object_values(vsr_df["Part #"]) if "Part #" in vsr_df else np.full(n, None, dtype=object)
+    reported_sw = _object_values(vsr_df["SW Version"]) if "SW Version" in vsr_df else np.full(n, None, dtype=object)
+
+    columns = {"ECU": _object_values(ecus)}
+    for col in MASTER_COLUMNS:
+        values = np.full(n, "N/A", dtype=object)
+        values[matched] = expected[col]
+        columns[col] = values
+
+    part_status = np.full(n, NOT_FOUND, dtype=object)
+    sw_status = np.full(n, NOT_FOUND, dtype=object)
+    check_part = matched & ~_is_blank(reported_part)
+    check_sw = matched & ~_is_blank(reported_sw)
+    part_status[check_part] = part_status_column(reported_part[check_part], columns["Part #"][check_part],
+                                                 expected["_part_suffix"][check_part[matched]])
+    sw_status[check_sw] = sw_status_column(reported_sw[check_sw], columns["SW Version"][check_sw],
+                                           expected["_sw_version"][check_sw[matched]])
+    part_status = pd.Categorical(part_status, dtype=STATUS_DTYPE)
+    sw_status = pd.Categorical(sw_status, dtype=STATUS_DTYPE)
+
+    results = pd.DataFrame({
+        "ECU": columns["ECU"],
+        "🚗Reported Part #": reported_part,
+        "📒Expected Part #": columns["Part #"],
+        "Part Status": part_status,
+        "🚗Reported SW": reported_sw,
+        "📒Expected SW": columns["SW Version"],
+        "SW Status": sw_status,
+        "Priority": columns["Priority"],
+        "FI Owner": columns["FI Owner"],
+        "Subsystem Owner": columns["Subsystem Owner"]
+    })
+    # Let pandas pick column dtypes the same way it did when results were built from row dicts
+    results = results.infer_objects()
+
+    # No positive response rows come out of the parser as "N/A" for both values
+    responding = (reported_part != "N/A") | (reported_sw != "N/A")
+    summary = ScanSummary(vehicle=dict(vehicle or {}), ecus=n, responding=int(responding.sum()),
+                          in_master=int(matched.sum()), part_status=_status_counts(part_status),
+                          sw_status=_status_counts(sw_status))
+    return results, summary
+
+
+@timed("compare")
+def compare_to_master(vsr_df, master_df, vehicle=None):
+    # master_df can be the raw master list or a MasterIndex. vehicle (parse_vehicle_info output)
+    # picks the Model Year / Body specific master rows when the list has them.
+    return _compare(vsr_df, master_df, vehicle)[0]
+
+
+@timed("compare")
+def compare_scan(scan, master_df):
+    # scan: a vsr_parser.ScanRecord. Returns (results_df, ScanSummary) from the same pass.
+    return _compare(scan.ecus, master_df, scan.vehicle)
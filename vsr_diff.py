@@ -0,0 +1,212 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from results_cache import BoundedCache
+from vsr_compare import build_master_index, compare_to_master
+
+# === CONFIGURATION ===
+SCAN_COLUMNS = ["ECU", "Part #", "SW Version"]
+DIFF_COLUMNS = ["From", "To", "ECU", "Change", "Old Part #", "New Part #", "Old SW", "New SW", "Direction"]
+SCAN_CACHE_SIZE = 64  # archived scans kept in memory for incremental diffs
+
+# Archived scans never change (they are keyed by content hash), so their ECU rows can be kept
+_scan_frames = BoundedCache(SCAN_CACHE_SIZE)
+
+
+# === DIFF ENGINE ===
+# All scans are stacked into one long frame; consecutive scans are paired with a single outer
+# merge on (pair, ECU, occurrence), so a whole history costs one join and one master comparison.
+
+def _same(old, new):
+    return (old == new) | (old.isna() & new.isna())
+
+
+def _is_match(status, present):
+    return present & (status == "✅ Match").to_numpy()
+
+
+def _stack(scans):
+    frames = [scan.reindex(columns=SCAN_COLUMNS).assign(_scan=i) for i, scan in enumerate(scans)]
+    if not frames:
+        return pd.DataFrame(columns=SCAN_COLUMNS + ["_scan"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def diff_stacked(stacked, labels, master_index=None, include_unchanged=False, vehicle=None):
+    # stacked: SCAN_COLUMNS plus "_scan", the position (0..len(labels)-1) of the scan each row belongs to.
+    # Each scan is diffed against the one before it. vehicle selects variant-specific master rows.
+    stacked = stacked.reset_index(drop=True)
+    labels = np.asarray(list(labels), dtype=object)
+    frame = stacked[SCAN_COLUMNS + ["_scan"]].copy()
+    frame["_occurrence"] = frame.groupby(["_scan", "ECU"], sort=False).cumcount()
+    if master_index is not None:
+        statuses = compare_to_master(frame, master_index, vehicle) if len(frame) else pd.DataFrame(
+            columns=["Part Status", "SW Status"])
+        frame["_part_status"] = statuses["Part Status"].to_numpy()
+        frame["_sw_status"] = statuses["SW Status"].to_numpy()
+
+    keys = ["_pair", "ECU", "_occurrence"]
+    old = frame[frame["_scan"] < len(labels) - 1].assign(_pair=lambda f: f["_scan"])
+    new = frame[frame["_scan"] > 0].assign(_pair=lambda f: f["_scan"] - 1)
+    pairs = old.drop(columns="_scan").merge(new.drop(columns="_scan"), on=keys, how="outer",
+                                            suffixes=("_old", "_new"), sort=False, indicator=True)
+    pairs = pairs.iloc[np.argsort(pairs["_pair"].to_numpy(), kind="stable")].reset_index(drop=True)
+
+    present_old = (pairs["_merge"] != "right_only").to_numpy()
+    present_new = (pairs["_merge"] != "left_only").to_numpy()
+    both = present_old & present_new
+    part_changed = both & ~_same(pairs["Part #_old"], pairs["Part #_new"]).to_numpy()
+    sw_changed = both & ~_same(pairs["SW Version_old"], pairs["SW Version_new"]).to_numpy()
+    change = np.select(
+        [~present_old, ~present_new, part_changed & sw_changed, part_changed, sw_changed],
+        ["➕ Added", "➖ Removed", "Part + SW changed", "Part changed", "SW changed"],
+        "Unchanged").astype(object)
+
+    pair = pairs["_pair"].to_numpy(dtype=int)
+    result = pd.DataFrame({
+        "From": labels[pair] if len(pair) else np.empty(0, dtype=object),
+        "To": labels[pair + 1] if len(pair) else np.empty(0, dtype=object),
+        "ECU": pairs["ECU"].to_numpy(dtype=object),
+        "Change": change,
+        "Old Part #": pairs["Part #_old"].to_numpy(dtype=object),
+        "New Part #": pairs["Part #_new"].to_numpy(dtype=object),
+        "Old SW": pairs["SW Version_old"].to_numpy(dtype=object),
+        "New SW": pairs["SW Version_new"].to_numpy(dtype=object),
+    })
+
+    if master_index is not None:
+        # A changed field moves toward the master if it matches now and didn't before, away if the reverse
+        part_moved = part_changed | ~both
+        sw_moved = sw_changed | ~both
+        part_delta = np.where(part_moved, _is_match(pairs["_part_status_new"], present_new).astype(int)
+                              - _is_match(pairs["_part_status_old"], present_old).astype(int), 0)
+        sw_delta = np.where(sw_moved, _is_match(pairs["_sw_status_new"], present_new).astype(int)
+                            - _is_match(pairs["_sw_status_old"], present_old).astype(int), 0)
+        toward = (part_delta > 0) | (sw_delta > 0)
+        away = (part_delta < 0) | (sw_delta < 0)
+        on_master = (~part_moved | _is_match(pairs["_part_status_new"], present_new)) & \
+                    (~sw_moved | _is_match(pairs["_sw_status_new"], present_new)) & present_new
+        in_master = build_master_index(master_index).contains(pairs["ECU"].to_numpy(dtype=object))
+        result["Direction"] = np.select(
+            [~in_master, toward & away, toward, away, on_master],
+            ["Not in master", "↕ Mixed", "⬆ Toward master", "⬇ Away from master", "Still on master"],
+            "Still off master").astype(object)
+    else:
+        result["Direction"] = "N/A"
+
+    if not include_unchanged:
+        result = result[change != "Unchanged"].reset_index(drop=True)
+    return result
+
+
+# === PUBLIC API ===
+
+def diff_history(scans, labels=None, master_index=None, include_unchanged=False, vehicle=None):
+    # scans: parse_vsr_html outputs, oldest first. labels name the scans in From/To (default 1..n).
+    # master_index: build_master_index output, enables the Direction column (for this vehicle's variant).
+    scans = list(scans)
+    labels = list(labels) if labels is not None else list(range(1, len(scans) + 1))
+    if len(labels) != len(scans):
+        raise ValueError("Need one label per scan")
+    return diff_stacked(_stack(scans), labels, master_index, include_unchanged, vehicle)
+
+
+def diff_scans(old_df, new_df, master_index=None, labels=("Previous", "Current"), include_unchanged=False,
+               vehicle=None):
+    return diff_history([old_df, new_df], labels, master_index, include_unchanged, vehicle)
+
+
+def _scan_label(scan):
+    when = scan["scan_time"] or scan["ingested_at"]
+    return f"{when} ({scan['file_name']})" if scan["file_name"] else when
+
+
+def diff_vin_history(archive, vin, master_index=None, include_unchanged=False):
+    # Whole archived history of a vehicle, read with a single catalog query
+    scans = archive.scans_for_vin(vin)
+    rows = archive.history_ecus(vin)
+    positions = pd.Series(np.arange(len(scans)), index=scans["sha256"])
+    rows["_scan"] = positions.reindex(rows["sha256"]).to_numpy()
+    labels = [_scan_label(scan) for _, scan in scans.iterrows()]
+    vehicle = {"Model Year": scans["model_year"].iloc[-1], "Body": scans["body"].iloc[-1]} if len(scans) else None
+    return diff_stacked(rows, labels, master_index, include_unchanged, vehicle)
+
+
+def load_scan(archive, digest):
+    # Callers must copy before modifying; the frame is shared with later lookups
+    scan = _scan_frames.get(digest)
+    if scan is None:
+        scan = archive.load_ecus(digest)
+        _scan_frames.put(digest, scan)
+    return scan
+
+
+def previous_scan(archive, vin, digest=None):
+    # Catalog row of the scan recorded just before `digest` (or the latest one if it isn't archived)
+    if not vin:
+        return None
+    scans = archive.scans_for_vin(vin)
+    if digest is not None:
+        current = np.flatnonzero(scans["sha256"].to_numpy() == digest)
+        if len(current):
+            scans = scans.iloc[:current[0]]
+    return scans.iloc[-1] if len(scans) else None
+
+
+def diff_against_previous(archive, vin, vsr_df, digest=None, master_index=None, vehicle=None):
+    # Incremental mode: compare a new scan only with the previous archived scan of the same VIN.
+    # Returns (previous catalog row or None, diff frame).
+    previous = previous_scan(archive, vin, digest)
+    if previous is None:
+        return None, pd.DataFrame(columns=DIFF_COLUMNS)
+    diff = diff_scans(load_scan(archive, previous["sha256"]), vsr_df, master_index,
+                      labels=(_scan_label(previous), "Current"), vehicle=vehicle)
+    return previous, diff
+
+
+# === CLI ===
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff VSR scans of the same vehicle")
+    parser.add_argument("files", nargs="*", help="VSR files, oldest first")
+    parser.add_argument("--vin", help="Diff the archived scan history of this VIN instead")
+    parser.add_argument("--archive", help="Archive folder (default: the VSR archive)")
+    parser.add_argument("--master", help="Master SW List .xlsx, adds the toward/away from master column")
+    parser.add_argument("--output", help="Write the diff to this .xlsx or .csv file")
+    args = parser.parse_args(argv)
+    if bool(args.vin) == bool(args.files):
+        parser.error("give either VSR files or --vin")
+
+    master_index = None
+    if args.master:
+        from master_list import get_master_index
+
+        master_index = get_master_index(args.master)
+
+    if args.vin:
+        from vsr_archive import VSR_ARCHIVE_DIR, VsrArchive
+
+        diff = diff_vin_history(VsrArchive(args.archive or VSR_ARCHIVE_DIR), args.vin, master_index)
+    else:
+        from vsr_parser import parse_vsr
+
+        records = [parse_vsr(Path(path).read_bytes()) for path in args.files]
+        diff = diff_history([record.ecus for record in records], [Path(path).name for path in args.files],
+                            master_index, vehicle=records[-1].vehicle)
+
+    if args.output:
+        if args.output.lower().endswith(".csv"):
+            diff.to_csv(args.output, index=False)
+        else:
+            diff.to_excel(args.output, index=False)
+        print(f"Wrote {len(diff)} changes to {args.output}")
+    else:
+        print(diff.to_string(index=False) if not diff.empty else "No differences")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
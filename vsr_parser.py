@@ -0,0 +1,252 @@
+import re
+import pandas as pd
+from dataclasses import dataclass
+from html import unescape
+from io import BytesIO
+from typing import Optional
+
+from diagnostics import timed
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional, the BeautifulSoup backends cover everything
+    etree = None
+
+# === CONFIGURATION ===
+ECU_TABLE_ID = "ecuInformationTable"
+PARSER_BACKENDS = ("auto", "lxml", "strainer", "soup")
+
+
+# === ROW EXTRACTION ===
+
+def _ecu_records(rows, get_text):
+    # Shared by every backend so they all build exactly the same records.
+    # get_text(cell, strip) must behave like BeautifulSoup's Tag.get_text(strip=...)
+    ecu_data = []
+    for cells in rows:
+        if not cells:
+            continue
+        if len(cells) == 2 and "No positive response" in get_text(cells[1], False):
+            ecu = get_text(cells[0], True)
+            ecu_data.append({"ECU": ecu, "Part #": "N/A", "SW Version": "N/A"})
+            continue
+        if len(cells) >= 8:
+            ecu = get_text(cells[0], True)
+            part_number = get_text(cells[3], True)
+            sw_version = get_text(cells[7], True)
+            ecu_data.append({
+                "ECU": ecu,
+                "Part #": part_number,
+                "SW Version": sw_version
+            })
+    return ecu_data
+
+
+def _soup_text(cell, strip):
+    return cell.get_text(strip=strip)
+
+
+def _lxml_text(cell, strip):
+    if strip:
+        return "".join(s.strip() for s in cell.itertext() if s.strip())
+    return "".join(cell.itertext())
+
+
+# === BACKENDS ===
+
+def _parse_soup(html):
+    # Original implementation: full html.parser tree of the whole page
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    ecu_table = soup.find("table", {"id": ECU_TABLE_ID})
+    if not ecu_table:
+        return []
+    rows = (row.find_all("td") for row in ecu_table.find_all("tr")[1:])
+    return _ecu_records(rows, _soup_text)
+
+
+def _parse_strainer(html):
+    # Still tokenizes the whole page, but only builds tree nodes for the ECU table
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    only_ecu_table = SoupStrainer("table", attrs={"id": ECU_TABLE_ID})
+    soup = BeautifulSoup(html, "html.parser", parse_only=only_ecu_table)
+    ecu_table = soup.find("table", {"id": ECU_TABLE_ID})
+    if not ecu_table:
+        return []
+    rows = (row.find_all("td") for row in ecu_table.find_all("tr")[1:])
+    return _ecu_records(rows, _soup_text)
+
+
+def _parse_lxml(text):
+    # Streams the page and stops at the ECU table's end tag. Everything closed before
+    # the table is freed as we go, so memory stays flat however big the export is.
+    data = text.encode("utf-8")
+    ecu_table = None
+    depth = 0
+    for event, elem in etree.iterparse(BytesIO(data), events=("start", "end"), html=True,
+                                       encoding="utf-8", recover=True):
+        if event == "start":
+            if depth:
+                if elem.tag == "table":
+                    depth += 1
+            elif elem.tag == "table" and elem.get("id") == ECU_TABLE_ID:
+                depth = 1
+            continue
+        if depth:
+            if elem.tag == "table":
+                depth -= 1
+                if not depth:
+                    ecu_table = elem
+                    break
+            continue
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    if ecu_table is None:
+        return []
+    rows = (list(row.iter("td")) for row in list(ecu_table.iter("tr"))[1:])
+    return _ecu_records(rows, _lxml_text)
+
+
+def _resolve_backend(backend):
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend '{backend}'. Choose one of: {', '.join(PARSER_BACKENDS)}")
+    if backend == "auto":
+        return "lxml" if etree is not None else "strainer"
+    if backend == "lxml" and etree is None:
+        return "strainer"
+    return backend
+
+
+def _decode(html):
+    # Raw bytes are decoded once per scan, the same way BeautifulSoup would decode them, so
+    # every backend and the header read the same text and non-ASCII cells come out identical
+    if isinstance(html, str):
+        return html
+    from bs4 import UnicodeDammit
+
+    return UnicodeDammit(html, is_html=True).unicode_markup or ""
+
+
+def _ecu_rows(text, backend):
+    backend = _resolve_backend(backend)
+    if backend == "lxml":
+        try:
+            ecu_data = _parse_lxml(text)
+        except (etree.LxmlError, ValueError):
+            ecu_data = None
+        if not ecu_data:
+            # Anything lxml can't stream (or where it found no table) gets a second
+            # look from the original parser, which is more forgiving of broken markup
+            ecu_data = _parse_soup(text)
+    elif backend == "strainer":
+        ecu_data = _parse_strainer(text)
+    else:
+        ecu_data = _parse_soup(text)
+    return ecu_data
+
+
+# === VEHICLE HEADER ===
+# Scan-tool exports put VIN / model year / body in a label-value header near the top of the page.
+# Matched on the raw markup so it costs one regex pass over the header, not a second tree. The
+# header ends where the ECU table starts; only a VIN is also looked for below the table.
+
+VIN_PATTERN = re.compile(r"\b[A-HJ-NPR-Z0-9]{17}\b")
+MODEL_YEAR_PATTERN = re.compile(r"(?:19|20)\d{2}")
+HEADER_SCAN_BYTES = 256 * 1024
+VEHICLE_FIELDS = {
+    "VIN": ("VIN", "Vehicle Identification Number"),
+    "Model Year": ("Model Year", "Year", "MY"),
+    "Body": ("Body", "Body Style", "Body Code"),
+    "Scan Time": ("Scan Date", "Date/Time", "Date", "Report Date"),
+}
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+_ECU_TABLE_START = re.compile(rf"<table\b[^>]*\b{ECU_TABLE_ID}\b", re.IGNORECASE)
+
+
+def _header_end(text):
+    found = _ECU_TABLE_START.search(text, 0, HEADER_SCAN_BYTES)
+    return found.start() if found else HEADER_SCAN_BYTES
+
+
+def _header_text(text):
+    # One "label | value" stream: tags become separators, entities are unescaped
+    return unescape(_TAG_PATTERN.sub("|", text))
+
+
+def _field_pattern(labels):
+    # Longest label first so "Body Style" isn't read as label "Body" with value "Style"; a label
+    # must end at a word boundary, so "Bodyshop" or "My Garage" are not labels at all
+    alternatives = "|".join(re.escape(label) for label in sorted(labels, key=len, reverse=True))
+    return re.compile(rf"(?:^|\|)\s*(?:{alternatives})(?![A-Za-z0-9])\s*:?\s*(?:\|\s*)*([^|]+?)\s*(?=\|)",
+                      re.IGNORECASE)
+
+
+_FIELD_PATTERNS = {field: _field_pattern(labels) for field, labels in VEHICLE_FIELDS.items()}
+# A value that fails its check is skipped for the next match: a wrong model year would send every
+# ECU to a variant row that doesn't exist
+_FIELD_CHECKS = {"Model Year": MODEL_YEAR_PATTERN.fullmatch}
+
+
+def _vehicle_fields(text):
+    end = _header_end(text)
+    header = _header_text(text[:end])
+    info = {}
+    for field, pattern in _FIELD_PATTERNS.items():
+        check = _FIELD_CHECKS.get(field)
+        values = (found.group(1).strip() for found in pattern.finditer(header))
+        info[field] = next((value for value in values if check is None or check(value)), None)
+    if not info["VIN"] or not VIN_PATTERN.fullmatch(info["VIN"].upper()):
+        found = VIN_PATTERN.search(header.upper())
+        if found is None and end < HEADER_SCAN_BYTES:
+            found = VIN_PATTERN.search(_header_text(text[:HEADER_SCAN_BYTES]).upper())
+        info["VIN"] = found.group(0) if found else None
+    else:
+        info["VIN"] = info["VIN"].upper()
+    return info
+
+
+# === PUBLIC API ===
+
+@dataclass(frozen=True)
+class ScanRecord:
+    # One VSR read in a single pass: the vehicle header fields and the ECU rows
+    ecus: pd.DataFrame
+    vin: Optional[str] = None
+    model_year: Optional[str] = None
+    body: Optional[str] = None
+    scan_time: Optional[str] = None
+
+    @property
+    def vehicle(self):
+        # The parse_vehicle_info dict that compare_to_master and the fleet store take
+        return {"VIN": self.vin, "Model Year": self.model_year, "Body": self.body, "Scan Time": self.scan_time}
+
+
+_RECORD_FIELDS = {"VIN": "vin", "Model Year": "model_year", "Body": "body", "Scan Time": "scan_time"}
+
+
+@timed("parse")
+def parse_vsr(html, backend="auto"):
+    # ECU rows and vehicle header from one decode of the page; the header is the start of the
+    # same text the ECU table is read from
+    text = _decode(html)
+    fields = _vehicle_fields(text)
+    return ScanRecord(pd.DataFrame(_ecu_rows(text, backend)),
+                      **{_RECORD_FIELDS[field]: value for field, value in fields.items()})
+
+
+@timed("parse")
+def parse_vsr_html(html, backend="auto"):
+    # ECU rows only
+    return pd.DataFrame(_ecu_rows(_decode(html), backend))
+
+
+def parse_vehicle_info(html):
+    # Header fields only; raw bytes are decoded no further than the header
+    if isinstance(html, bytes):
+        html = _decode(html[:HEADER_SCAN_BYTES])
+    return _vehicle_fields(html)
@@ -0,0 +1,322 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+import batch_check
+from action_plan import generate_action_plan
+from batch_check import VSR_EXTENSIONS, check_vsr_file, output_name
+from diagnostics import enable_stage_log
+from excel_export import write_excel_report
+from fleet_store import FLEET_STORE_DIR
+from master_list import MASTER_LIST_PATH, get_master, master_list_version
+from vsr_parser import PARSER_BACKENDS
+
+# Ingest service: every VSR dropped into a folder is checked and reported without opening the UI.
+#   python watch_folder.py "D:\EOL scans\incoming" --output-dir "D:\EOL scans\reports" --workers 4
+
+# === CONFIGURATION ===
+DEBOUNCE_SECONDS = 2.0  # a file must stop changing for this long before it is read
+POLL_SECONDS = 0.5
+STATUS_SECONDS = 5.0  # how often status.json is rewritten
+MASTER_CHECK_SECONDS = 30.0
+LATENCY_WINDOW = 1000  # recent files kept for the latency percentiles
+
+log = logging.getLogger("vsr_watch")
+
+
+# === WORKER ===
+# Runs in the pool processes. batch_check._init_worker sets up the master index, parser backend,
+# action plan folder and fleet store; the Excel report is written here so results never travel
+# back to the service process.
+
+_output_dir = None
+
+
+def _init_watch_worker(master_index, parser_backend, output_dir, fleet_dir):
+    global _output_dir
+    batch_check._init_worker(master_index, parser_backend, output_dir, fleet_dir)
+    _output_dir = output_dir
+
+
+def process_vsr_file(path):
+    # Returns (path, error, ECU rows, worker seconds)
+    path, results_df, _, digest, error, seconds = check_vsr_file(path)
+    if results_df is None:
+        return path, error, 0, seconds
+    start = time.perf_counter()
+    try:
+        # Named like the action plan, after the content that was checked: scan tools reuse file
+        # names, the content hash tells them apart
+        report = Path(_output_dir) / output_name(path, digest, "_results.xlsx")
+        write_excel_report(str(report), results_df, generate_action_plan(results_df))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return path, error, len(results_df), seconds + time.perf_counter() - start
+
+
+# === FILE EVENTS ===
+
+class _DropFolderHandler(FileSystemEventHandler):
+    def __init__(self, service):
+        self.service = service
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.service.touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.service.touch(event.src_path)
+
+    def on_moved(self, event):
+        # Scan tools that write to a temp name and rename it when done
+        if not event.is_directory:
+            self.service.touch(event.dest_path)
+
+
+# === SERVICE ===
+
+class WatchService:
+    # Pipeline: file events -> pending (debounced by size/mtime) -> bounded pool.
+    # At most max_in_flight files are submitted at once; the rest wait as paths on disk, so a
+    # burst of hundreds of files costs one small dict entry each, never their contents.
+
+    def __init__(self, drop_dir, output_dir, master_path=MASTER_LIST_PATH, workers=None, max_in_flight=None,
+                 parser_backend="auto", fleet_dir=None, debounce=DEBOUNCE_SECONDS):
+        self.drop_dir = Path(drop_dir)
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.master_path = master_path
+        self.workers = workers or os.cpu_count()
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.parser_backend = parser_backend
+        self.fleet_dir = fleet_dir
+        self.debounce = debounce
+
+        self._lock = threading.Lock()
+        self._pending = {}  # path -> [first seen, last change, (size, mtime_ns)]
+        self._ready = deque()  # (path, first seen), oldest first
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # set when a pool slot frees up, so the dispatcher doesn't sleep through it
+        self._executor = None
+        self._master_version = None
+
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.ecu_rows = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)  # (seconds from first event to report, worker seconds)
+
+    # --- event side (watchdog thread) ---
+
+    def touch(self, path):
+        if Path(path).suffix.lower() not in VSR_EXTENSIONS:
+            return
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.setdefault(path, [now, now, None])
+            entry[1] = now
+
+    # --- dispatcher ---
+
+    def _collect_ready(self):
+        # A file is ready once its size and mtime held still for the debounce period and it can be opened
+        now = time.monotonic()
+        with self._lock:
+            candidates = [(path, entry) for path, entry in self._pending.items() if now - entry[1] >= self.debounce]
+        for path, entry in candidates:
+            try:
+                stat = os.stat(path)
+                with open(path, "rb"):
+                    pass
+            except FileNotFoundError:
+                with self._lock:
+                    self._pending.pop(path, None)
+                continue
+            except OSError:
+                continue  # still locked by the writer
+            signature = (stat.st_size, stat.st_mtime_ns)
+            with self._lock:
+                if entry[2] != signature:
+                    entry[1], entry[2] = now, signature  # changed since last look; wait another period
+                    continue
+                del self._pending[path]
+            self._ready.append((path, entry[0]))
+
+    def _start_pool(self):
+        _, master_index, self._master_version = get_master(self.master_path)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_watch_worker,
+            initargs=(master_index, self.parser_backend, str(self.output_dir), self.fleet_dir))
+        log.info("Worker pool started (%d workers, master list %s)", self.workers, self.master_path)
+
+    def _check_master(self):
+        # A saved master list takes effect for files submitted after the restart
+        try:
+            current = master_list_version(self.master_path)
+        except OSError:
+            return
+        if current != self._master_version:
+            log.info("Master list changed, restarting the worker pool")
+            self._executor.shutdown(wait=True)
+            self._start_pool()
+
+    def _submit_ready(self):
+        # Backpressure: once max_in_flight files are in the pool, the rest stay queued as paths
+        while self._ready and self._slots.acquire(blocking=False):
+            path, first_seen = self._ready.popleft()
+            with self._lock:
+                self.in_flight += 1
+            try:
+                future = self._executor.submit(process_vsr_file, path)
+            except BrokenProcessPool:
+                # A worker died; the files it had are reported as failed by _finished. This one
+                # goes back to the front of the queue for the new pool.
+                with self._lock:
+                    self.in_flight -= 1
+                self._slots.release()
+                self._ready.appendleft((path, first_seen))
+                log.warning("Worker pool broke, restarting it")
+                self._executor.shutdown(wait=False)
+                self._start_pool()
+                continue
+            future.add_done_callback(lambda f, path=path, first_seen=first_seen: self._finished(f, path, first_seen))
+
+    def _finished(self, future, path, first_seen):
+        try:
+            _, error, rows, worker_seconds = future.result()
+        except Exception as e:  # the worker process died
+            error, rows, worker_seconds = f"{type(e).__name__}: {e}", 0, 0.0
+        latency = time.monotonic() - first_seen
+        with self._lock:
+            self.in_flight -= 1
+            if error:
+                self.failed += 1
+            else:
+                self.processed += 1
+                self.ecu_rows += rows
+            self._latencies.append((latency, worker_seconds))
+        self._slots.release()
+        self._wake.set()
+        if error:
+            log.warning("FAILED %s: %s", path, error)
+        else:
+            log.info("Checked %s (%d ECUs) in %.2f s, %.2f s after it arrived", Path(path).name, rows,
+                     worker_seconds, latency)
+
+    # --- metrics ---
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(latency for latency, _ in self._latencies)
+            worker = sorted(seconds for _, seconds in self._latencies)
+            stats = {
+                "pending": len(self._pending),
+                "ready": len(self._ready),
+                "in_flight": self.in_flight,
+                "processed": self.processed,
+                "failed": self.failed,
+                "ecu_rows": self.ecu_rows,
+            }
+
+        def percentile(values, q):
+            return round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else None
+
+        stats["queue_depth"] = stats["pending"] + stats["ready"] + stats["in_flight"]
+        stats["latency_p50_seconds"] = percentile(latencies, 0.50)
+        stats["latency_p95_seconds"] = percentile(latencies, 0.95)
+        stats["worker_p50_seconds"] = percentile(worker, 0.50)
+        stats["worker_p95_seconds"] = percentile(worker, 0.95)
+        return stats
+
+    def _write_status(self):
+        status = self.stats()
+        status["updated"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        tmp = self.output_dir / "status.json.tmp"
+        tmp.write_text(json.dumps(status, indent=2), encoding="utf-8")
+        os.replace(tmp, self.output_dir / "status.json")
+
+    # --- lifecycle ---
+
+    def run(self, process_existing=False):
+        self._start_pool()
+        if process_existing:
+            for path in sorted(self.drop_dir.iterdir()):
+                if path.is_file():
+                    self.touch(str(path))
+        observer = Observer()
+        observer.schedule(_DropFolderHandler(self), str(self.drop_dir), recursive=False)
+        observer.start()
+        log.info("Watching %s -> %s", self.drop_dir, self.output_dir)
+
+        last_status = last_master_check = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                self._collect_ready()
+                self._submit_ready()
+                now = time.monotonic()
+                if now - last_master_check >= MASTER_CHECK_SECONDS:
+                    self._check_master()
+                    last_master_check = now
+                if now - last_status >= STATUS_SECONDS:
+                    self._write_status()
+                    last_status = now
+                self._wake.wait(POLL_SECONDS)
+                self._wake.clear()
+        finally:
+            observer.stop()
+            observer.join()
+            self._executor.shutdown(wait=True)
+            self._write_status()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+# === CLI ===
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a drop folder and check every VSR written to it")
+    parser.add_argument("drop_dir", help="Folder the scan tools write .htm/.html VSR files to")
+    parser.add_argument("--output-dir", default="vsr_watch_output", help="Reports, action plans and status.json")
+    parser.add_argument("--master", default=MASTER_LIST_PATH, help="Master SW List workbook")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Files checked at once before new files wait (default: 2 x workers)")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS,
+                        help="Seconds a file must stop changing before it is read")
+    parser.add_argument("--parser", choices=PARSER_BACKENDS, default="auto", help="parse_vsr_html backend")
+    parser.add_argument("--fleet", nargs="?", const=str(FLEET_STORE_DIR), default=None, metavar="DIR",
+                        help="Also add every result to the fleet results store (default folder: %(const)s)")
+    parser.add_argument("--process-existing", action="store_true", help="Also check files already in the folder")
+    parser.add_argument("--stage-log", metavar="FILE", help="Append per-stage timings of every worker as JSON lines")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.stage_log:
+        enable_stage_log(args.stage_log)
+    service = WatchService(args.drop_dir, args.output_dir, args.master, args.workers, args.max_in_flight,
+                           args.parser, args.fleet, args.debounce)
+    try:
+        service.run(args.process_existing)
+    except KeyboardInterrupt:
+        pass
+    stats = service.stats()
+    print(f"Stopped: {stats['processed']} checked, {stats['failed']} failed")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())